@@ -0,0 +1,71 @@
+"""
+Vectorized Black–Scholes (routes/Researcher/option_pricing.py) vs per-row
+mibian, for a chain of strikes.
+
+    python -m benchmarks.option_pricing_benchmark --strikes 50 --repeat 20
+
+Run from the repository root; needs numpy and mibian.
+"""
+import argparse
+import time
+
+import mibian
+import numpy as np
+
+from routes.Researcher import option_pricing
+
+
+def make_chain(strikes: int, spot: float = 22500.0, days: float = 14.0, rate: float = 7.0, vol: float = 16.0):
+    strike = np.linspace(spot * 0.9, spot * 1.1, strikes)
+    is_call = np.arange(strikes) % 2 == 0
+    price = option_pricing.price(spot, strike, rate, days, vol, is_call)
+    return spot, strike, days, rate, is_call, price
+
+
+def mibian_loop(spot, strike, days, rate, is_call, price):
+    out = []
+    for k, call, p in zip(strike, is_call, price):
+        if call:
+            iv = mibian.BS([spot, k, rate, days], callPrice=p).impliedVolatility
+            bs = mibian.BS([spot, k, rate, days], volatility=iv)
+            out.append((iv, bs.callDelta, bs.gamma, bs.vega, bs.callTheta, bs.callRho))
+        else:
+            iv = mibian.BS([spot, k, rate, days], putPrice=p).impliedVolatility
+            bs = mibian.BS([spot, k, rate, days], volatility=iv)
+            out.append((iv, bs.putDelta, bs.gamma, bs.vega, bs.putTheta, bs.putRho))
+    return out
+
+
+def vectorized(spot, strike, days, rate, is_call, price):
+    iv = option_pricing.implied_volatility(price, spot, strike, rate, days, is_call)
+    return iv, option_pricing.greeks(spot, strike, rate, days, iv, is_call)
+
+
+def timed(fn, repeat, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--strikes", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    chain = make_chain(args.strikes)
+    loop_time, loop_result = timed(mibian_loop, args.repeat, *chain)
+    vec_time, (iv, _) = timed(vectorized, args.repeat, *chain)
+
+    max_iv_diff = max(abs(a[0] - b) for a, b in zip(loop_result, iv))
+    print(f"{args.strikes} strikes, best of {args.repeat}")
+    print(f"  mibian loop : {loop_time * 1000:9.2f} ms")
+    print(f"  numpy       : {vec_time * 1000:9.2f} ms  ({loop_time / vec_time:.0f}x)")
+    print(f"  max |IV diff| : {max_iv_diff:.4f} vol points")
+
+
+if __name__ == "__main__":
+    main()
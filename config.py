@@ -35,14 +35,55 @@ SMTP_PORT=os.getenv("smtp_port")
 SMTP_USER=os.getenv("smtp_user")
 SMTP_PASSWORD=os.getenv("smtp_pass")
 
-COM_SMTP_SERVER=os.getenv("com_smtp_server")
-COM_SMTP_PORT=os.getenv("com_smtp_port")
-COM_SMTP_USER=os.getenv("com_smtp_user")
+COM_SMTP_SERVER=os.getenv("com_smtp_server", "smtpout.secureserver.net")
+COM_SMTP_PORT=os.getenv("com_smtp_port", "465")
+COM_SMTP_USER=os.getenv("com_smtp_user", "compliance@pridecons.com")
 COM_SMTP_PASSWORD=os.getenv("com_smtp_pass")
+COM_SMTP_POOL_SIZE=int(os.getenv("com_smtp_pool_size", "2"))
 
 PRIDEBUZZ_ONESIGNAL_APP_ID=os.getenv("PRIDEBUZZ_ONESIGNAL_APP_ID")
 PRIDEBUZZ_ONESIGNAL_API_KEY=os.getenv("PRIDEBUZZ_ONESIGNAL_API_KEY")
 
 CASHFREE_APP_ID=os.getenv("CASHFREE_APP_ID")
 CASHFREE_SECRET_KEY=os.getenv("CASHFREE_SECRET_KEY")
-CASHFREE_PRODUCTION=os.getenv("CASHFREE_PRODUCTION")
\ No newline at end of file
+CASHFREE_PRODUCTION=os.getenv("CASHFREE_PRODUCTION")
+
+# Bulk-mail SMTP connection pool
+SMTP_POOL_SIZE=int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_MAX_MESSAGES_PER_CONNECTION=int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+
+# Bulk-mail campaign worker
+BULK_MAIL_RATE_PER_SECOND=float(os.getenv("BULK_MAIL_RATE_PER_SECOND", "5"))
+BULK_MAIL_CONCURRENCY=int(os.getenv("BULK_MAIL_CONCURRENCY", "4"))
+BULK_MAIL_MAX_ATTEMPTS=int(os.getenv("BULK_MAIL_MAX_ATTEMPTS", "3"))
+BULK_MAIL_POLL_INTERVAL=float(os.getenv("BULK_MAIL_POLL_INTERVAL", "5"))
+
+# Transactional email outbox drainer
+OUTBOX_POLL_INTERVAL=float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+OUTBOX_BATCH_SIZE=int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_MAX_ATTEMPTS=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+
+# Scheduled push notifications
+NOTIFICATION_TIMEZONE=os.getenv("NOTIFICATION_TIMEZONE", "Asia/Kolkata")
+NOTIFICATION_WARMUP_MINUTES=int(os.getenv("NOTIFICATION_WARMUP_MINUTES", "5"))
+NOTIFICATION_JOB_STALE_MINUTES=int(os.getenv("NOTIFICATION_JOB_STALE_MINUTES", "10"))
+# FCM HTTP requests in flight per process; the SDK's HTTP client pools 10
+# connections, so going higher mostly buys extra TLS handshakes
+FCM_MAX_CONCURRENT_REQUESTS=int(os.getenv("FCM_MAX_CONCURRENT_REQUESTS", "10"))
+
+# Researcher live feed (WebSockets)
+WS_SEND_QUEUE_SIZE=int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+WS_SEND_TIMEOUT=float(os.getenv("WS_SEND_TIMEOUT", "10"))
+WS_REPLAY_BUFFER_SIZE=int(os.getenv("WS_REPLAY_BUFFER_SIZE", "500"))
+# protocol-level ping/pong, done by uvicorn (pass --ws websockets --ws-ping-interval
+# --ws-ping-timeout when starting uvicorn from the command line); the interval
+# also paces the SSE keep-alive comments
+WS_PING_INTERVAL=float(os.getenv("WS_PING_INTERVAL", "30"))
+WS_PING_TIMEOUT=float(os.getenv("WS_PING_TIMEOUT", "20"))
+WS_MAX_CONNECTIONS_PER_SERVICE=int(os.getenv("WS_MAX_CONNECTIONS_PER_SERVICE", "5000"))
+RESEARCHER_CACHE_TTL=int(os.getenv("RESEARCHER_CACHE_TTL", "300"))
+
+# Plans
+PLAN_STATUS_CACHE_TTL=int(os.getenv("PLAN_STATUS_CACHE_TTL", "60"))
+PLAN_SUMMARY_REFRESH_CRON=os.getenv("PLAN_SUMMARY_REFRESH_CRON", "5 0 * * *")
+PLAN_EXPIRY_SOON_DAYS=int(os.getenv("PLAN_EXPIRY_SOON_DAYS", "3"))
@@ -0,0 +1,180 @@
+import time
+
+from sqlalchemy import Index, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex
+
+from config import logger
+from db.connection import Base
+from db import models  # noqa: F401  (registers every table on Base.metadata)
+
+
+# Columns added to existing tables after their first create_all.
+ADD_COLUMNS = [
+    "ALTER TABLE push_tokens ADD COLUMN IF NOT EXISTS device_id VARCHAR(255)",
+    "ALTER TABLE push_tokens ADD COLUMN IF NOT EXISTS platform VARCHAR(20)",
+    "ALTER TABLE push_tokens ADD COLUMN IF NOT EXISTS last_seen TIMESTAMP WITHOUT TIME ZONE",
+    "ALTER TABLE researcher ADD COLUMN IF NOT EXISTS search_vector TSVECTOR",
+    "ALTER TABLE notification_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITH TIME ZONE",
+]
+
+# Column type changes, each guarded so it only runs against the old type.
+ALTER_COLUMN_TYPES = [
+    # user_details.service_active_date: VARCHAR 'YYYY-MM-DD' → DATE. Values
+    # that are not a valid ISO date become NULL (treated as no active plan).
+    # The regex alone lets impossible dates such as '2024-02-30' through, and
+    # one failing CAST would abort the whole ALTER, so the cast is done in a
+    # helper that turns the error into NULL. pg_temp: gone with the session.
+    """
+    CREATE OR REPLACE FUNCTION pg_temp.safe_iso_date(value TEXT) RETURNS DATE AS $$
+    BEGIN
+        IF value !~ '^[0-9]{4}-[0-9]{2}-[0-9]{2}' THEN
+            RETURN NULL;
+        END IF;
+        RETURN CAST(substring(value FROM 1 FOR 10) AS DATE);
+    EXCEPTION
+        WHEN invalid_datetime_format OR datetime_field_overflow THEN
+            RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'user_details'
+              AND column_name = 'service_active_date'
+              AND data_type <> 'date'
+        ) THEN
+            ALTER TABLE user_details
+                ALTER COLUMN service_active_date TYPE DATE
+                USING pg_temp.safe_iso_date(service_active_date);
+        END IF;
+    END
+    $$
+    """,
+]
+
+# Keeps researcher.search_vector in sync with title (weight A) and message
+# (weight B). The 'simple' configuration does no stemming, so stock names
+# and tickers are indexed as written.
+RESEARCHER_SEARCH_TRIGGER = [
+    """
+    CREATE OR REPLACE FUNCTION researcher_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.message, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS researcher_search_vector_trigger ON researcher",
+    """
+    CREATE TRIGGER researcher_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, message ON researcher
+    FOR EACH ROW EXECUTE FUNCTION researcher_search_vector_update()
+    """,
+    # backfill rows written before the trigger existed
+    """
+    UPDATE researcher SET search_vector =
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(message, '')), 'B')
+    WHERE search_vector IS NULL
+    """,
+]
+
+
+def add_missing_columns(engine: Engine):
+    with engine.begin() as conn:
+        for statement in ADD_COLUMNS:
+            conn.execute(text(statement))
+
+
+def convert_column_types(engine: Engine):
+    with engine.begin() as conn:
+        for statement in ALTER_COLUMN_TYPES:
+            conn.execute(text(statement))
+
+
+def install_triggers(engine: Engine):
+    with engine.begin() as conn:
+        for statement in RESEARCHER_SEARCH_TRIGGER:
+            conn.execute(text(statement))
+
+
+# pg advisory lock serialising start-up migrations across uvicorn workers
+MIGRATION_LOCK_KEY = 50_034_001
+MIGRATION_LOCK_POLL_SECONDS = 0.5
+
+
+def _create_index_concurrently_sql(index: Index, engine: Engine) -> str:
+    sql = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+    if sql.startswith("CREATE UNIQUE INDEX "):
+        return sql.replace("CREATE UNIQUE INDEX ", "CREATE UNIQUE INDEX CONCURRENTLY ", 1)
+    return sql.replace("CREATE INDEX ", "CREATE INDEX CONCURRENTLY ", 1)
+
+
+def ensure_indexes(engine: Engine):
+    """
+    `create_all` only creates indexes together with a brand-new table, so an
+    index added to a model later never reaches an existing database. Create
+    any declared index that is missing.
+
+    Built with CREATE INDEX CONCURRENTLY (outside a transaction) so writes to
+    large tables such as push_tokens and researcher are not blocked while the
+    index builds. A concurrent build that failed earlier leaves an INVALID
+    index behind, which IF NOT EXISTS would skip; such leftovers are dropped
+    and rebuilt.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    invalid = conn.execute(
+                        text(
+                            "SELECT NOT i.indisvalid FROM pg_index i "
+                            "JOIN pg_class c ON c.oid = i.indexrelid "
+                            "WHERE c.relname = :name"
+                        ),
+                        {"name": index.name},
+                    ).scalar()
+                    if invalid:
+                        logger.warning(f"Rebuilding invalid index {index.name}")
+                        conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+                    conn.execute(text(_create_index_concurrently_sql(index, engine)))
+                except Exception as e:
+                    # keep going: one bad index must not hold back the others
+                    logger.error(f"Cannot create index {index.name}: {e}")
+
+
+def run_migrations(engine: Engine):
+    """
+    Table creation plus idempotent schema upgrades, run on startup.
+
+    Every uvicorn worker calls this; a session-level advisory lock makes them
+    take turns, so the first one does the work and the rest find nothing left
+    to do instead of racing on the same DDL.
+
+    The lock is polled with pg_try_advisory_lock rather than waited for with
+    pg_advisory_lock: a backend blocked inside pg_advisory_lock holds a
+    snapshot, and CREATE INDEX CONCURRENTLY in the lock holder waits for
+    every older snapshot to go away – a deadlock through the client that
+    Postgres cannot detect.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        while not lock_conn.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY}
+        ).scalar():
+            time.sleep(MIGRATION_LOCK_POLL_SECONDS)
+        try:
+            Base.metadata.create_all(engine)
+            logger.info("Tables created successfully!")
+            add_missing_columns(engine)
+            convert_column_types(engine)
+            install_triggers(engine)
+            ensure_indexes(engine)
+            logger.info("Schema migrations applied")
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, JSON, DateTime,func, ARRAY, Text, ForeignKey,Float, Date, Boolean
+from sqlalchemy import Column, Integer, String, JSON, DateTime,func, ARRAY, Text, ForeignKey,Float, Date, Boolean, LargeBinary, UniqueConstraint, Index
 from db.connection import Base
 from datetime import datetime
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.orm import relationship, declarative_base, deferred
+from sqlalchemy.dialects.postgresql import TSVECTOR
 import uuid
 import pytz
 
@@ -15,6 +16,10 @@ class OTP(Base):
 
 class UserDetails(Base):
     __tablename__ = "user_details"
+    __table_args__ = (
+        # plan checks and notification audiences: service = ? AND service_active_date >= today
+        Index("ix_user_details_service_active_date", "service", "service_active_date"),
+    )
     
     # Use phone number as the primary key.
     phone_number = Column(String(10), primary_key=True, unique=True, index=True, nullable=False)
@@ -23,7 +28,7 @@ class UserDetails(Base):
     password = Column(String(255), nullable=False)  # Hashed password storage.
     role = Column(String(10), default="user", nullable=False)  # Default role is 'user'.
     service = Column(String(100), nullable=False)
-    service_active_date = Column(String(100), nullable=True, default=None)
+    service_active_date = Column(Date, nullable=True, default=None)
 
     
     # Optional: record creation timestamp.
@@ -32,6 +37,24 @@ class UserDetails(Base):
     # Relationship to refresh tokens.
     tokens = relationship("TokenDetails", back_populates="user", cascade="all, delete-orphan")
 
+class ActiveUser(Base):
+    """
+    Users whose plan is active, per service. Rebuilt nightly from user_details
+    (routes/Plan/active_users.py) and kept current by the registration and
+    edit_user paths; readers still filter service_active_date >= today, so
+    plans lapsing during the day drop out without waiting for the rebuild.
+    """
+    __tablename__ = "active_users"
+    __table_args__ = (
+        Index("ix_active_users_service_active_date", "service", "service_active_date"),
+    )
+
+    phone_number = Column(String(10), ForeignKey("user_details.phone_number", ondelete="CASCADE"), primary_key=True)
+    service = Column(String(100), nullable=False)
+    service_active_date = Column(Date, nullable=False)
+    # date of the nightly rebuild that wrote the row (NULL: written by an edit)
+    refreshed_on = Column(Date, nullable=True)
+
 class TokenDetails(Base):
     __tablename__ = "token_details"
     
@@ -47,6 +70,14 @@ class TokenDetails(Base):
 
 class Option(Base):
     __tablename__ = "researcher"
+    __table_args__ = (
+        # `service @> ARRAY[...]` lookups (home-screen feed per service)
+        Index("ix_researcher_service_gin", "service", postgresql_using="gin"),
+        # newest-first keyset pagination
+        Index("ix_researcher_timestamp_id", "timestamp", "id"),
+        # full-text search over title + message
+        Index("ix_researcher_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     id        = Column(Integer, primary_key=True, index=True)
     title     = Column(String, nullable=False)
@@ -54,12 +85,21 @@ class Option(Base):
     timestamp = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
     message   = Column(Text, nullable=False)
     service   = Column(ARRAY(String), nullable=False)
+    # maintained by the researcher_search_vector_update trigger (db/migrations.py)
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
 
 class PushToken(Base):
     __tablename__ = "push_tokens"
+    __table_args__ = (
+        # one live token per (user, device); rows without device_id are legacy registrations
+        Index("uq_push_tokens_user_device", "user_id", "device_id", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String(10), ForeignKey("user_details.phone_number", ondelete="CASCADE"), nullable=False)
+    user_id = Column(String(10), ForeignKey("user_details.phone_number", ondelete="CASCADE"), nullable=False, index=True)
     token = Column(String, unique=True, index=True)
+    device_id = Column(String(255), nullable=True)
+    platform = Column(String(20), nullable=True)  # android | ios | web
+    last_seen = Column(DateTime, default=datetime.utcnow, nullable=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
@@ -133,3 +173,104 @@ class EStamp(Base):
     mobile = Column(String(20), nullable=False)
     # Here we store the file information as a string (e.g., file path or base64 encoded text).
     file = Column(String, nullable=True)
+
+
+class MailCampaign(Base):
+    __tablename__ = "mail_campaigns"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    subject = Column(String(255), nullable=False)
+    content = Column(Text, nullable=False)
+    # loading → running → completed  (or failed if the upload could not be read)
+    status = Column(String(20), nullable=False, default="loading", index=True)
+    total = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    attachments = relationship("MailCampaignAttachment", cascade="all, delete-orphan")
+    recipients = relationship("MailCampaignRecipient", cascade="all, delete-orphan", passive_deletes=True)
+
+class MailCampaignAttachment(Base):
+    __tablename__ = "mail_campaign_attachments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(String, ForeignKey("mail_campaigns.id", ondelete="CASCADE"), nullable=False, index=True)
+    filename = Column(String(255), nullable=False)
+    content = Column(LargeBinary, nullable=False)
+
+class MailCampaignRecipient(Base):
+    __tablename__ = "mail_campaign_recipients"
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "email", name="uq_mail_campaign_recipient"),
+        Index("ix_mail_campaign_recipients_campaign_status", "campaign_id", "status"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(String, ForeignKey("mail_campaigns.id", ondelete="CASCADE"), nullable=False)
+    email = Column(String(255), nullable=False)
+    name = Column(String(255), nullable=True)
+    # pending → sending → sent | failed
+    status = Column(String(10), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    recipient = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=True)
+    # the complete RFC 5322 message (headers, body, attachments) as bytes
+    message = Column(LargeBinary, nullable=False)
+    # pending → sending → sent | failed
+    status = Column(String(10), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+class NotificationJob(Base):
+    __tablename__ = "notification_jobs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    service = Column(String(100), nullable=False)
+    title = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    # queued → running → completed | failed
+    status = Column(String(20), nullable=False, default="queued")
+    # audience size (push tokens), counted when the job starts
+    total = Column(Integer, nullable=False, default=0)
+    success_count = Column(Integer, nullable=False, default=0)
+    failure_count = Column(Integer, nullable=False, default=0)
+    pruned_count = Column(Integer, nullable=False, default=0)
+    # sample of per-token failures: [{token, error, error_kind}, ...]
+    failures = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # touched after every chunk; a running job whose heartbeat stops was
+    # orphaned by a restart / crash of its worker
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+class NotificationSchedule(Base):
+    __tablename__ = "notification_schedules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    service = Column(String(100), nullable=False)
+    # exactly one of: a crontab ("15 9 * * 1-5") for recurring sends, or run_at for a one-off
+    cron = Column(String(100), nullable=True)
+    run_at = Column(DateTime(timezone=True), nullable=True)
+    timezone = Column(String(50), nullable=False, default="Asia/Kolkata")
+    enabled = Column(Boolean, nullable=False, default=True)
+    # fire time most recently claimed by a worker (prevents duplicate sends)
+    last_run_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
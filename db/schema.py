@@ -14,7 +14,7 @@ class UserOut(BaseModel):
     service: str
     email: EmailStr
     created_at: datetime
-    service_active_date: str
+    service_active_date: Optional[date] = None
 
     class Config:
         orm_mode = True
@@ -66,7 +66,7 @@ class PasswordReset(BaseModel):
 class UserEditSchema(BaseModel):
     email: Optional[EmailStr] = None
     service: Optional[str] = None
-    service_active_date: str = None
+    service_active_date: Optional[date] = None
 
     class Config:
         orm_mode = True
@@ -108,6 +108,29 @@ TradeType = Literal["Intraday", "Positional", "Swing", "Momentum"]
 OptionType = Literal["Call", "Put"]
 
 
+class OptionPricingIn(BaseModel):
+    """One strike to analyse; give either the market `price` or a `volatility` (percent)."""
+    underlying: float = Field(..., gt=0)
+    strike: float = Field(..., gt=0)
+    days_to_expiry: float = Field(..., gt=0)
+    option_type: OptionType
+    interest_rate: float = 7.0                 # annual, percent
+    price: Optional[float] = Field(None, gt=0)
+    volatility: Optional[float] = Field(None, gt=0)
+
+class OptionPricingRequest(BaseModel):
+    options: List[OptionPricingIn] = Field(..., min_length=1, max_length=1000)
+
+class OptionPricingOut(BaseModel):
+    implied_volatility: Optional[float]        # percent; None when the price cannot be inverted (outside arbitrage bounds, no time value)
+    price: Optional[float]
+    delta: Optional[float]
+    gamma: Optional[float]
+    vega: Optional[float]                      # per 1 % volatility
+    theta: Optional[float]                     # per calendar day
+    rho: Optional[float]                       # per 1 % rate
+
+
 class KYCOTPRequest(BaseModel):
     mobile: str
     email: EmailStr
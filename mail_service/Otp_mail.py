@@ -1,14 +1,9 @@
 from fastapi.responses import JSONResponse
 from email.message import EmailMessage
-import smtplib
-import ssl
-
-async def Otp_mail( email, otp ):
-    smtp_server = "smtpout.secureserver.net"
-    smtp_port = 465
-    smtp_user = "compliance@pridecons.com"
-    smtp_pass = "Pride@#0308"  # move to environment variable in production
+from sqlalchemy.orm import Session
+from routes.mail_service.outbox import enqueue_email
 
+def Otp_mail( email, otp, db: Session ):
     try:
         # Create email
         msg = EmailMessage()
@@ -29,13 +24,10 @@ async def Otp_mail( email, otp ):
         Pride Trading Consultancy Private Limited
         """)
 
-        # Send email
-        context = ssl.create_default_context()
-        with smtplib.SMTP_SSL(smtp_server, smtp_port, context=context) as server:
-            server.login(smtp_user, smtp_pass)
-            server.send_message(msg)
+        # Stage in the outbox; it is sent once the caller commits its transaction
+        enqueue_email(db, msg)
 
-        return {"message": "OTP Sent!","email":email}
+        return {"message": "OTP queued!","email":email}
 
     except Exception as e:
         return JSONResponse(content={"message": "Failed to send OTP.", "error": str(e)}, status_code=500)
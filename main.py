@@ -11,6 +11,8 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
 from db.connection import engine
 from db import models
+from db.migrations import run_migrations
+from config import WS_PING_INTERVAL, WS_PING_TIMEOUT
 import os
 import json
 
@@ -21,11 +23,17 @@ from routes.E_Stamp import eStamp
 from routes.convert_xml_to_pdf import convert_xml_to_pdf
 
 from routes.mail_service import bulk_mail
+from routes.mail_service.smtp_pool import bulk_smtp_pool
+from routes.mail_service.campaign_worker import campaign_worker
+from routes.mail_service.async_transport import compliance_mail_transport
+from routes.mail_service.outbox import outbox_drainer
+from scheduler import scheduler
 
 from routes.auth import login
-from routes.Researcher import researcher
+from routes.Researcher import researcher, analytics
 from routes.Plan import CheckPlan
-from routes.NewsSubscriptionManager import NewsSubscriptionManager, send_notification
+from routes.Plan.active_users import start_plan_jobs
+from routes.NewsSubscriptionManager import NewsSubscriptionManager, send_notification, scheduled_notification
 from routes.payment import payments
 
 # Configure Logging
@@ -72,6 +80,32 @@ async def on_startup():
         backend=InMemoryBackend(),     # or RedisBackend(...) if you prefer
         prefix="fastapi-cache"         # optional; used to namespace your keys
     )
+    # resume / drain persisted bulk-mail campaigns
+    campaign_worker.start()
+    # deliver transactional mails staged in email_outbox
+    outbox_drainer.start()
+    # scheduled / recurring push notifications
+    scheduler.start()
+    scheduled_notification.start_schedules()
+    # fail notification jobs orphaned by a restart / crash
+    send_notification.start_job_reaper()
+    # nightly active-user summary (plan expiry, notification audiences)
+    start_plan_jobs()
+    # relay researcher updates published by any worker to this worker's sockets
+    await researcher.broker.start(researcher.manager.deliver, researcher.manager.reset)
+    # keep-alive comments on researcher SSE streams
+    researcher.manager.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    scheduler.shutdown(wait=False)
+    await researcher.broker.stop()
+    await researcher.manager.stop()
+    await campaign_worker.stop()
+    await outbox_drainer.stop()
+    bulk_smtp_pool.close_all()
+    await compliance_mail_transport.close_all()
 
 
 # Root API Endpoint
@@ -90,14 +124,15 @@ app.include_router(redirect.router)
 app.include_router(payments.router)
 app.include_router(login.router)
 app.include_router(researcher.router)
+app.include_router(analytics.router)
 app.include_router(CheckPlan.router)
 app.include_router(NewsSubscriptionManager.router)
 app.include_router(send_notification.router)
+app.include_router(scheduled_notification.router)
 
 # Database Table Creation
 try:
-    models.Base.metadata.create_all(engine)
-    logger.info("Tables created successfully!")
+    run_migrations(engine)
 except Exception as e:
     logger.error(f"Error creating tables: {e}", exc_info=True)
 
@@ -105,4 +140,13 @@ except Exception as e:
 
 # Run FastAPI with Uvicorn
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    # websocket ping frames; a peer that misses a pong is closed by uvicorn
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=True,
+        ws="websockets",
+        ws_ping_interval=WS_PING_INTERVAL,
+        ws_ping_timeout=WS_PING_TIMEOUT,
+    )
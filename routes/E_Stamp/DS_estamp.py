@@ -152,7 +152,8 @@ async def init_estamp(documentUrl: str,UUID_id:str, db: Session = Depends(get_db
             data = response.json()
             requests_data=data.get("requests")[0]
             signing_url=requests_data.get("signing_url")
-            await send_agreement(EStampUser.recepient_email, EStampUser.second_party_name, signing_url)
+            send_agreement(EStampUser.recepient_email, EStampUser.second_party_name, signing_url, db)
+            db.commit()
 
     except Exception as e:
         # Catch any unexpected exceptions (network issues, timeouts, etc.)
@@ -522,7 +522,8 @@ async def init_estamp(
     requests_data=data.get("requests")[0]
     signing_url=requests_data.get("signing_url")
 
-    await send_agreement(recepientEmail, secondPartyName, signing_url)
+    send_agreement(recepientEmail, secondPartyName, signing_url, db)
+    db.commit()
 
     return signing_url
     
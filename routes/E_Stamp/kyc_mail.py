@@ -1,15 +1,9 @@
 from fastapi.responses import JSONResponse
 from email.message import EmailMessage
-import smtplib
-import ssl
-
-async def send_agreement(email: str, name: str, signing_url: str):
-    # Replace with your actual SMTP settings or load them from environment variables
-    smtp_server = "smtpout.secureserver.net"
-    smtp_port = 465
-    smtp_user = "compliance@pridecons.com"
-    smtp_pass = "Pride@#0308"  # move to environment variable in production
+from sqlalchemy.orm import Session
+from routes.mail_service.outbox import enqueue_email
 
+def send_agreement(email: str, name: str, signing_url: str, db: Session):
     try:
         # Create email
         msg = EmailMessage()
@@ -35,13 +29,10 @@ Thanks & Regards,
 Pride Trading Consultancy Pvt. Ltd.
         """)
 
-        # Send email using a secure SSL context
-        context = ssl.create_default_context()
-        with smtplib.SMTP_SSL(smtp_server, smtp_port, context=context) as server:
-            server.login(smtp_user, smtp_pass)
-            server.send_message(msg)
+        # Stage in the outbox; it is sent once the caller commits its transaction
+        enqueue_email(db, msg)
 
-        return {"message": "Agreement sent successfully!", "email": email, "name": name}
+        return {"message": "Agreement queued successfully!", "email": email, "name": name}
 
     except Exception as e:
         return JSONResponse(
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from typing import Optional, List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import Optional, List, Tuple
+from threading import Lock
+from cachetools import TTLCache
+from sqlalchemy import func, text, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from db.connection import get_db
@@ -15,6 +20,11 @@ router = APIRouter(
 class TokenRegister(BaseModel):
     user_id: str
     push_token: str
+    device_id: Optional[str] = None
+    platform: Optional[str] = None  # android | ios | web
+
+class BulkTokenRegister(BaseModel):
+    tokens: List[TokenRegister] = Field(..., max_length=1000)
 
 # Response Models
 class TokenResponse(BaseModel):
@@ -34,57 +44,190 @@ class TokensListResponse(BaseModel):
     tokens: List[TokenResponse]
     total_count: int
 
+PUSH_TOKEN_UPSERT_ATTEMPTS = 3
+
+
+def upsert_push_tokens(db: Session, registrations: List[TokenRegister]) -> int:
+    """
+    Register many (user, device, token) triples in one transaction:
+
+    1. drop the previous token of every (user_id, device_id) that now reports
+       a different token (FCM token rotation on the same device);
+    2. INSERT ... ON CONFLICT (token) DO UPDATE, so a token that already exists
+       is re-pointed at its current user/device and its last_seen refreshed.
+
+    ON CONFLICT can only arbitrate on the token index. Two concurrent
+    registrations of the same (user_id, device_id) with different tokens
+    therefore both pass step 1, and the second insert violates
+    uq_push_tokens_user_device. Both steps run in a savepoint and are
+    retried: by then the other transaction has committed, so step 1 now
+    removes its row.
+    """
+    # last registration wins if a device or a token appears twice in one batch
+    latest = {}
+    for r in registrations:
+        key = ("device", r.user_id, r.device_id) if r.device_id else ("token", r.push_token)
+        latest[key] = r
+    rows = {
+        r.push_token: {
+            "user_id": r.user_id,
+            "token": r.push_token,
+            "device_id": r.device_id,
+            "platform": r.platform,
+        }
+        for r in latest.values()
+    }
+    if not rows:
+        return 0
+
+    devices = {(r["user_id"], r["device_id"]) for r in rows.values() if r["device_id"]}
+    for attempt in range(PUSH_TOKEN_UPSERT_ATTEMPTS):
+        try:
+            with db.begin_nested():
+                _replace_push_tokens(db, rows, devices)
+            return len(rows)
+        except IntegrityError:
+            if not devices or attempt == PUSH_TOKEN_UPSERT_ATTEMPTS - 1:
+                raise
+
+
+def _replace_push_tokens(db: Session, rows: dict, devices: set) -> None:
+    if devices:
+        (
+            db.query(PushToken)
+            .filter(
+                tuple_(PushToken.user_id, PushToken.device_id).in_(list(devices)),
+                PushToken.token.notin_(list(rows)),
+            )
+            .delete(synchronize_session=False)
+        )
+
+    stmt = pg_insert(PushToken).values(
+        [dict(r, last_seen=func.now(), updated_at=func.now()) for r in rows.values()]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PushToken.token],
+        set_={
+            "user_id": stmt.excluded.user_id,
+            "device_id": func.coalesce(stmt.excluded.device_id, PushToken.device_id),
+            "platform": func.coalesce(stmt.excluded.platform, PushToken.platform),
+            "last_seen": func.now(),
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt)
+
 @router.post("/users/register-push-token")
 def register_token(
     payload: TokenRegister,
     db: Session = Depends(get_db),
 ):
-    """Register or update a push token for a user"""
+    """Register or refresh a push token for one of a user's devices"""
     try:
-        db_token = (
-            db.query(PushToken)
-            .filter(PushToken.user_id == payload.user_id)
-            .first()
-        )
-        if db_token:
-            db_token.token = payload.push_token
-            db.refresh(db_token)
-        else:
-            db_token = PushToken(
-                user_id=payload.user_id,
-                token=payload.push_token
-            )
-            db.add(db_token)
+        upsert_push_tokens(db, [payload])
         db.commit()
         return {"status": "ok", "message": "Token registered successfully"}
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail="Failed to register token")
 
+@router.post("/users/register-push-tokens")
+def register_tokens_bulk(
+    payload: BulkTokenRegister,
+    db: Session = Depends(get_db),
+):
+    """Register many push tokens at once (e.g. app-version token migrations)"""
+    try:
+        count = upsert_push_tokens(db, payload.tokens)
+        db.commit()
+        return {"status": "ok", "message": f"{count} token(s) registered successfully"}
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to register tokens")
+
+def _token_dict(token: PushToken) -> dict:
+    return {
+        "id": token.id,
+        "user_id": token.user_id,
+        "token": token.token,
+        "device_id": token.device_id,
+        "platform": token.platform,
+        "last_seen": str(token.last_seen) if token.last_seen else None,
+        "updated_at": str(token.updated_at) if token.updated_at else None
+    }
+
+# total counts are expensive on a large table and only need to be roughly current
+_count_cache: TTLCache = TTLCache(maxsize=256, ttl=60)
+_count_lock = Lock()
+
+def _filtered(query, user_id: Optional[str], service: Optional[str]):
+    if user_id is not None:
+        query = query.filter(PushToken.user_id == user_id)
+    if service is not None:
+        query = query.join(UserDetails, UserDetails.phone_number == PushToken.user_id).filter(
+            UserDetails.service == service
+        )
+    return query
+
+def _count_tokens(db: Session, user_id: Optional[str], service: Optional[str]) -> Tuple[int, bool]:
+    """
+    Total for the admin list, cached for a minute. Unfiltered, it comes from
+    the planner's row estimate (pg_class.reltuples) instead of a full scan.
+    Returns (count, is_approximate).
+    """
+    key = (user_id, service)
+    with _count_lock:
+        cached = _count_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = None
+    if user_id is None and service is None:
+        estimate = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'push_tokens'::regclass")
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            result = (int(estimate), True)
+    if result is None:
+        result = (_filtered(db.query(func.count(PushToken.id)).select_from(PushToken), user_id, service).scalar(), False)
+
+    with _count_lock:
+        _count_cache[key] = result
+    return result
+
 @router.get("/users/push-tokens")
 def get_all_tokens(
+    after_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    user_id: Optional[str] = None,
+    service: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100,
     db: Session = Depends(get_db),
 ):
-    """Get all push tokens with pagination"""
+    """
+    Get push tokens, optionally filtered by user or service.
+
+    Paginate with `after_id` (pass the previous page's `next_after_id`); this
+    seeks on the primary key, so deep pages cost the same as the first one.
+    `skip` is still accepted for old clients.
+    """
     try:
-        tokens = db.query(PushToken).offset(skip).limit(limit).all()
-        total_count = db.query(PushToken).count()
+        query = _filtered(db.query(PushToken), user_id, service)
+        if after_id is not None:
+            query = query.filter(PushToken.id > after_id)
+        elif skip:
+            query = query.offset(skip)
+        tokens = query.order_by(PushToken.id).limit(limit).all()
+        total_count, approximate = _count_tokens(db, user_id, service)
         
         # Manually convert to dict to avoid serialization issues
-        tokens_data = []
-        for token in tokens:
-            tokens_data.append({
-                "id": token.id,
-                "user_id": token.user_id,
-                "token": token.token,
-                "updated_at": str(token.updated_at) if token.updated_at else None
-            })
+        tokens_data = [_token_dict(token) for token in tokens]
         
         return {
             "tokens": tokens_data,
-            "total_count": total_count
+            "total_count": total_count,
+            "total_count_approximate": approximate,
+            "next_after_id": tokens[-1].id if len(tokens) == limit else None
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to fetch tokens")
@@ -94,27 +237,23 @@ def get_token_by_user_id(
     user_id: str,
     db: Session = Depends(get_db),
 ):
-    """Get push token for a specific user"""
+    """Get the most recently seen push token of a user, plus all of their devices"""
     try:
-        db_token = (
+        db_tokens = (
             db.query(PushToken)
             .filter(PushToken.user_id == user_id)
-            .first()
+            .order_by(PushToken.last_seen.desc().nullslast(), PushToken.id.desc())
+            .all()
         )
         
-        if not db_token:
+        if not db_tokens:
             raise HTTPException(
                 status_code=404, 
                 detail=f"Push token not found for user_id: {user_id}"
             )
         
         # Manually convert to dict
-        return {
-            "id": db_token.id,
-            "user_id": db_token.user_id,
-            "token": db_token.token,
-            "updated_at": str(db_token.updated_at) if db_token.updated_at else None
-        }
+        return dict(_token_dict(db_tokens[0]), devices=[_token_dict(t) for t in db_tokens])
     except HTTPException:
         raise
     except Exception as e:
@@ -123,27 +262,27 @@ def get_token_by_user_id(
 @router.delete("/users/{user_id}/push-token")
 def delete_token_by_user_id(
     user_id: str,
+    device_id: Optional[str] = None,
     db: Session = Depends(get_db),
 ):
-    """Delete push token for a specific user"""
+    """Delete the push tokens of a user (only one device's if device_id is given)"""
     try:
-        db_token = (
-            db.query(PushToken)
-            .filter(PushToken.user_id == user_id)
-            .first()
-        )
+        query = db.query(PushToken).filter(PushToken.user_id == user_id)
+        if device_id is not None:
+            query = query.filter(PushToken.device_id == device_id)
+        deleted = query.delete(synchronize_session=False)
         
-        if not db_token:
+        if not deleted:
+            db.rollback()
             raise HTTPException(
                 status_code=404, 
                 detail=f"Push token not found for user_id: {user_id}"
             )
         
-        db.delete(db_token)
         db.commit()
         return {"status": "ok", "message": "Token deleted successfully"}
     except HTTPException:
         raise
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail="Failed to delete token")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to delete token")
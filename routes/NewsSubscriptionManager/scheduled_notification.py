@@ -0,0 +1,304 @@
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from config import logger, NOTIFICATION_TIMEZONE, NOTIFICATION_WARMUP_MINUTES
+from db.connection import get_db, SessionLocal
+from db.models import NotificationSchedule, NotificationJob
+from routes.NewsSubscriptionManager.send_notification import (
+    iter_audience_tokens,
+    run_notification_job,
+)
+from scheduler import scheduler
+
+router = APIRouter(
+    prefix="/notification",
+    tags=["notification"],
+)
+
+WARMUP_LEAD = timedelta(minutes=NOTIFICATION_WARMUP_MINUTES)
+# pre-computed audiences older than this are not trusted at send time
+WARM_AUDIENCE_MAX_AGE = WARMUP_LEAD + timedelta(minutes=5)
+SYNC_INTERVAL_SECONDS = 60
+
+# schedule_id → (computed_at, token chunks), filled by the warm-up job
+_warm_audiences: Dict[int, Tuple[datetime, List[List[str]]]] = {}
+# schedule_id → trigger signature currently registered in this process
+_registered: Dict[int, tuple] = {}
+_lock = Lock()
+
+
+# Request / response models
+class ScheduleCreate(BaseModel):
+    msg_title: str
+    msg_body: str
+    service: str
+    cron: Optional[str] = None
+    run_at: Optional[datetime] = None
+    timezone: str = NOTIFICATION_TIMEZONE
+
+
+def _send_job_id(schedule_id: int) -> str:
+    return f"notification-schedule-{schedule_id}"
+
+
+def _warm_job_id(schedule_id: int) -> str:
+    return f"notification-warmup-{schedule_id}"
+
+
+def _trigger(schedule: NotificationSchedule):
+    if schedule.cron:
+        return CronTrigger.from_crontab(schedule.cron, timezone=schedule.timezone)
+    return DateTrigger(run_date=schedule.run_at, timezone=schedule.timezone)
+
+
+def _signature(schedule: NotificationSchedule) -> tuple:
+    return (schedule.cron, schedule.run_at, schedule.timezone, schedule.service)
+
+
+# ── scheduler jobs ──────────────────────────────────────────────────────
+def warm_audience(schedule_id: int):
+    """Pre-compute the schedule's audience token list a few minutes before it fires."""
+    db = SessionLocal()
+    try:
+        schedule = db.get(NotificationSchedule, schedule_id)
+        if not schedule or not schedule.enabled:
+            return
+        chunks = list(iter_audience_tokens(db, schedule.service))
+        with _lock:
+            _warm_audiences[schedule_id] = (datetime.now(timezone.utc), chunks)
+        logger.info(
+            f"Warmed audience for notification schedule {schedule_id}: "
+            f"{sum(len(c) for c in chunks)} token(s)"
+        )
+    finally:
+        db.close()
+
+
+def _plan_warmup(schedule_id: int):
+    """Queue warm_audience for WARMUP_LEAD before the schedule's next fire time."""
+    job = scheduler.get_job(_send_job_id(schedule_id))
+    next_run = getattr(job, "next_run_time", None)
+    if next_run is None:
+        return
+    warm_at = next_run - WARMUP_LEAD
+    now = datetime.now(next_run.tzinfo)
+    scheduler.add_job(
+        warm_audience,
+        DateTrigger(run_date=max(warm_at, now)),
+        args=[schedule_id],
+        id=_warm_job_id(schedule_id),
+        replace_existing=True,
+        misfire_grace_time=None,
+    )
+
+
+def fire_schedule(schedule_id: int):
+    """
+    Send a scheduled notification. Every worker runs the scheduler, so the
+    send is claimed first: only the worker whose UPDATE moves last_run_at to
+    this minute sends it.
+    """
+    fire_minute = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    db = SessionLocal()
+    try:
+        claimed = (
+            db.query(NotificationSchedule)
+            .filter(
+                NotificationSchedule.id == schedule_id,
+                NotificationSchedule.enabled.is_(True),
+                or_(
+                    NotificationSchedule.last_run_at.is_(None),
+                    NotificationSchedule.last_run_at < fire_minute,
+                ),
+            )
+            .update({"last_run_at": fire_minute}, synchronize_session=False)
+        )
+        if not claimed:
+            db.rollback()
+            return
+
+        schedule = db.get(NotificationSchedule, schedule_id)
+        if not schedule.cron:
+            # one-off: done after this send
+            schedule.enabled = False
+        job = NotificationJob(service=schedule.service, title=schedule.title, body=schedule.body)
+        db.add(job)
+        db.commit()
+        job_id = job.id
+    finally:
+        db.close()
+
+    with _lock:
+        warm = _warm_audiences.pop(schedule_id, None)
+    token_chunks = None
+    if warm and datetime.now(timezone.utc) - warm[0] <= WARM_AUDIENCE_MAX_AGE:
+        token_chunks = warm[1]
+    logger.info(
+        f"Firing notification schedule {schedule_id} as job {job_id} "
+        f"({'pre-warmed' if token_chunks is not None else 'cold'} audience)"
+    )
+    run_notification_job(job_id, token_chunks)
+
+
+def _after_fire(schedule_id: int):
+    try:
+        fire_schedule(schedule_id)
+    finally:
+        _plan_warmup(schedule_id)
+
+
+# ── registration ────────────────────────────────────────────────────────
+def _register(schedule: NotificationSchedule):
+    scheduler.add_job(
+        _after_fire,
+        _trigger(schedule),
+        args=[schedule.id],
+        id=_send_job_id(schedule.id),
+        replace_existing=True,
+        misfire_grace_time=60,
+        coalesce=True,
+    )
+    _registered[schedule.id] = _signature(schedule)
+    _plan_warmup(schedule.id)
+
+
+def _unregister(schedule_id: int):
+    for job_id in (_send_job_id(schedule_id), _warm_job_id(schedule_id)):
+        try:
+            scheduler.remove_job(job_id)
+        except JobLookupError:
+            pass
+    _registered.pop(schedule_id, None)
+    with _lock:
+        _warm_audiences.pop(schedule_id, None)
+
+
+def sync_schedules():
+    """
+    Reconcile this process's jobs with notification_schedules. Runs at start-up
+    and every minute, so schedules created / deleted through another worker
+    are picked up.
+    """
+    db = SessionLocal()
+    try:
+        schedules = db.query(NotificationSchedule).filter(NotificationSchedule.enabled.is_(True)).all()
+    finally:
+        db.close()
+
+    now = datetime.now(timezone.utc)
+    active = {}
+    for schedule in schedules:
+        if not schedule.cron and (schedule.run_at is None or schedule.run_at < now - timedelta(minutes=1)):
+            continue
+        active[schedule.id] = schedule
+
+    for schedule_id in list(_registered):
+        if schedule_id not in active:
+            _unregister(schedule_id)
+    for schedule_id, schedule in active.items():
+        if _registered.get(schedule_id) != _signature(schedule):
+            try:
+                _register(schedule)
+            except Exception as e:
+                logger.error(f"Cannot register notification schedule {schedule_id}: {e}")
+
+
+def start_schedules():
+    """Called once the scheduler is running (main.py start-up)."""
+    scheduler.add_job(
+        sync_schedules,
+        "interval",
+        seconds=SYNC_INTERVAL_SECONDS,
+        id="notification-schedule-sync",
+        next_run_time=datetime.now(timezone.utc),
+        replace_existing=True,
+        coalesce=True,
+    )
+
+
+def _serialize(schedule: NotificationSchedule) -> dict:
+    job = scheduler.get_job(_send_job_id(schedule.id))
+    return {
+        "id": schedule.id,
+        "msg_title": schedule.title,
+        "msg_body": schedule.body,
+        "service": schedule.service,
+        "cron": schedule.cron,
+        "run_at": schedule.run_at,
+        "timezone": schedule.timezone,
+        "enabled": schedule.enabled,
+        "last_run_at": schedule.last_run_at,
+        "next_run_at": getattr(job, "next_run_time", None),
+    }
+
+
+# ── endpoints ───────────────────────────────────────────────────────────
+@router.post("/schedules", status_code=201)
+def create_schedule(req: ScheduleCreate, db: Session = Depends(get_db)):
+    """
+    Schedule a push notification: either recurring (`cron`, standard 5-field
+    crontab in `timezone`, e.g. "15 9 * * 1-5" for market open) or one-off
+    (`run_at`). The audience is pre-computed a few minutes before each send.
+    """
+    if bool(req.cron) == bool(req.run_at):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'cron' or 'run_at'.")
+    try:
+        tz = ZoneInfo(req.timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Unknown timezone: {req.timezone}")
+
+    # A naive run_at is wall-clock time in `timezone`. Store it aware: the
+    # column is timestamptz, and Postgres would otherwise read a naive value
+    # in the DB session's TimeZone.
+    run_at = req.run_at
+    if run_at is not None and run_at.tzinfo is None:
+        run_at = run_at.replace(tzinfo=tz)
+
+    schedule = NotificationSchedule(
+        title=req.msg_title,
+        body=req.msg_body,
+        service=req.service,
+        cron=req.cron,
+        run_at=run_at,
+        timezone=req.timezone,
+        enabled=True,
+    )
+    try:
+        trigger = _trigger(schedule)
+    except (ValueError, LookupError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid schedule: {e}")
+    if trigger.get_next_fire_time(None, datetime.now(timezone.utc)) is None:
+        raise HTTPException(status_code=400, detail="Schedule never fires (run_at is in the past?).")
+
+    db.add(schedule)
+    db.commit()
+    db.refresh(schedule)
+    _register(schedule)
+    return _serialize(schedule)
+
+
+@router.get("/schedules")
+def list_schedules(db: Session = Depends(get_db)):
+    schedules = db.query(NotificationSchedule).order_by(NotificationSchedule.id).all()
+    return [_serialize(s) for s in schedules]
+
+
+@router.delete("/schedules/{schedule_id}")
+def delete_schedule(schedule_id: int, db: Session = Depends(get_db)):
+    schedule = db.get(NotificationSchedule, schedule_id)
+    if not schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    db.delete(schedule)
+    db.commit()
+    _unregister(schedule_id)
+    return {"status": "ok", "message": "Schedule deleted successfully"}
@@ -1,22 +1,49 @@
-from fastapi import APIRouter, HTTPException, Depends
-from datetime import date
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel
 import firebase_admin
 from firebase_admin import credentials, messaging
+from sqlalchemy import func, or_, select
 from sqlalchemy.orm import Session
 
-from db.connection import get_db
-from db.models import UserDetails, PushToken
+from db.connection import get_db, SessionLocal
+from db.models import ActiveUser, PushToken, NotificationJob
+from config import logger, NOTIFICATION_JOB_STALE_MINUTES, FCM_MAX_CONCURRENT_REQUESTS
+from scheduler import scheduler
+from routes.Plan.active_users import plan_today
 
 import os
 import json
 import time
 import asyncio
 import concurrent.futures
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Callable, Iterable, Iterator
 from dotenv import load_dotenv
 import firebase_admin
 from firebase_admin import credentials, messaging
+from firebase_admin import exceptions as fcm_exceptions
+
+
+# send_each_for_multicast sends one HTTP request per token from a thread pool
+# sized to the message, so concurrency is bounded here instead: every call
+# carries at most FCM_MAX_CONCURRENT_REQUESTS tokens and only one call runs
+# at a time in this process, whatever the callers' own thread pools.
+_fcm_send_lock = threading.Lock()
+
+
+def prune_dead_tokens(db: Session, tokens: List[str]) -> int:
+    """Delete push tokens FCM reported as unregistered/invalid, in one statement."""
+    if not tokens:
+        return 0
+    deleted = (
+        db.query(PushToken)
+        .filter(PushToken.token.in_(tokens))
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
 
 class FCMBatchSender:
     def __init__(self):
@@ -130,6 +157,234 @@ class FCMBatchSender:
         
         return results
     
+    # FCM accepts at most 500 tokens per multicast request
+    MULTICAST_LIMIT = 500
+
+    @staticmethod
+    def _build_platform_configs(title: str, body: str):
+        """Notification / Android / APNs payloads shared by every device of a broadcast."""
+        notification = messaging.Notification(title=title, body=body)
+        android = messaging.AndroidConfig(
+            notification=messaging.AndroidNotification(
+                title=title,
+                body=body,
+                sound='default',
+                priority="high",
+                default_sound=True,
+                default_vibrate_timings=True,
+                default_light_settings=True
+            ),
+            priority="high"
+        )
+        apns = messaging.APNSConfig(
+            payload=messaging.APNSPayload(
+                aps=messaging.Aps(
+                    alert=messaging.ApsAlert(title=title, body=body),
+                    badge=1,
+                    sound="default"
+                )
+            ),
+            headers={"apns-priority": "10"}
+        )
+        return notification, android, apns
+
+    @staticmethod
+    def classify_error(exc: Exception) -> str:
+        """
+        'dead'      – the token will never work again (uninstalled app, token
+                      from another Firebase project, malformed token): prune it
+        'transient' – FCM/APNs hiccup or quota: worth retrying
+        'error'     – anything else (e.g. a bad payload): neither
+        """
+        if isinstance(exc, (messaging.UnregisteredError, messaging.SenderIdMismatchError)):
+            return 'dead'
+        if isinstance(exc, fcm_exceptions.InvalidArgumentError) and "registration token" in str(exc).lower():
+            return 'dead'
+        if isinstance(exc, (messaging.QuotaExceededError,
+                            fcm_exceptions.UnavailableError,
+                            fcm_exceptions.InternalError,
+                            fcm_exceptions.DeadlineExceededError)):
+            return 'transient'
+        return 'error'
+
+    def send_multicast_batch(self, tokens: List[str], title: str, body: str,
+                             data: Dict[str, Any] = None, max_workers: int = 5,
+                             max_retries: int = 3, backoff_seconds: float = 1.0) -> Dict:
+        """
+        Send one notification to many devices using FCM multicast. The FCM v1
+        API has no batch endpoint: send_each_for_multicast sends one HTTP
+        request per token, from a thread pool with one thread per message.
+        Plan capacity on one request per device.
+
+        Tokens are split into chunks of 500, handled by up to `max_workers`
+        threads. Each chunk is sent in send_each_for_multicast calls of at
+        most FCM_MAX_CONCURRENT_REQUESTS tokens, one call at a time per
+        process (see _fcm_send_lock). So FCM_MAX_CONCURRENT_REQUESTS is the
+        real bound on concurrent HTTP requests, however many chunks or
+        broadcasts are in flight. Per-token results are mapped back from
+        the responses (same result shape as send_individual_batch).
+
+        Failures are classified; only transient ones are retried (with
+        exponential backoff), and unregistered/invalid tokens are reported in
+        'dead_tokens' so the caller can prune them.
+        """
+        print(f"🚀 Multicasting notification to {len(tokens)} devices...")
+
+        results = {
+            'success_count': 0,
+            'failure_count': 0,
+            'responses': [],
+            'successful_tokens': [],
+            'failed_tokens': [],
+            'dead_tokens': []
+        }
+        if not tokens:
+            return results
+
+        notification, android, apns = self._build_platform_configs(title, body)
+        payload_data = data or {}
+
+        call_size = max(1, FCM_MAX_CONCURRENT_REQUESTS)
+
+        def send_call(tokens_part: List[str]) -> List[Dict]:
+            message = messaging.MulticastMessage(
+                tokens=tokens_part,
+                notification=notification,
+                data=payload_data,
+                android=android,
+                apns=apns,
+            )
+            try:
+                with _fcm_send_lock:
+                    batch = messaging.send_each_for_multicast(message)
+            except Exception as e:
+                # the whole call failed – report every token it carried
+                kind = self.classify_error(e)
+                return [
+                    {'success': False, 'token': token, 'message_id': None,
+                     'error': str(e), 'error_kind': kind}
+                    for token in tokens_part
+                ]
+            return [
+                {
+                    'success': resp.success,
+                    'token': tokens_part[i],
+                    'message_id': resp.message_id,
+                    'error': str(resp.exception) if resp.exception else None,
+                    'error_kind': self.classify_error(resp.exception) if resp.exception else None
+                }
+                for i, resp in enumerate(batch.responses)
+            ]
+
+        def send_chunk(chunk: List[str]) -> List[Dict]:
+            chunk_results: List[Dict] = []
+            for start in range(0, len(chunk), call_size):
+                chunk_results.extend(send_call(chunk[start:start + call_size]))
+            return chunk_results
+
+        final: Dict[str, Dict] = {}
+        pending = list(tokens)
+        requests_made = 0
+        for attempt in range(max_retries + 1):
+            if attempt:
+                delay = backoff_seconds * 2 ** (attempt - 1)
+                print(f"   🔁 Retrying {len(pending)} transient failure(s) in {delay:.1f}s")
+                time.sleep(delay)
+
+            chunks = [
+                pending[start:start + self.MULTICAST_LIMIT]
+                for start in range(0, len(pending), self.MULTICAST_LIMIT)
+            ]
+            requests_made += sum(-(-len(chunk) // call_size) for chunk in chunks)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for chunk_results in executor.map(send_chunk, chunks):
+                    for result in chunk_results:
+                        result['attempts'] = attempt + 1
+                        final[result['token']] = result
+
+            pending = [t for t in pending if final[t]['error_kind'] == 'transient']
+            if not pending:
+                break
+
+        for index, token in enumerate(tokens):
+            result = final[token]
+            result['index'] = index
+            results['responses'].append(result)
+            if result['success']:
+                results['success_count'] += 1
+                results['successful_tokens'].append(token)
+            else:
+                results['failure_count'] += 1
+                results['failed_tokens'].append(token)
+                if result['error_kind'] == 'dead':
+                    results['dead_tokens'].append(token)
+
+        print(f"   ✅ {results['success_count']} sent, ❌ {results['failure_count']} failed "
+              f"({len(results['dead_tokens'])} dead) in {requests_made} multicast call(s)")
+        return results
+
+    def send_multicast_stream(self, token_chunks: Iterable[List[str]], title: str, body: str,
+                              data: Dict[str, Any] = None, max_workers: int = 5,
+                              on_chunk: Callable[[Dict], None] = None,
+                              keep_responses: bool = True) -> Dict:
+        """
+        Like send_multicast_batch, but consumes token chunks as they are
+        produced (e.g. straight from a DB cursor): every chunk is handed to a
+        worker thread as soon as it arrives, with a bounded number in flight so
+        memory stays flat regardless of audience size.
+
+        Each in-flight chunk is a send_multicast_batch call with one worker.
+        Their FCM calls share the process-wide bound of
+        FCM_MAX_CONCURRENT_REQUESTS concurrent requests. `max_workers` only
+        lets reading, sending and result handling of different chunks
+        overlap.
+
+        `on_chunk` is called with each chunk's results as it completes (progress
+        reporting); with keep_responses=False only counts and dead tokens are
+        accumulated.
+        """
+        results = {
+            'success_count': 0,
+            'failure_count': 0,
+            'responses': [],
+            'successful_tokens': [],
+            'failed_tokens': [],
+            'dead_tokens': []
+        }
+
+        def merge(offset: int, chunk_results: Dict):
+            for result in chunk_results['responses']:
+                result['index'] += offset
+            if on_chunk:
+                on_chunk(chunk_results)
+            for key in ('success_count', 'failure_count'):
+                results[key] += chunk_results[key]
+            results['dead_tokens'].extend(chunk_results['dead_tokens'])
+            if keep_responses:
+                results['responses'].extend(chunk_results['responses'])
+                results['successful_tokens'].extend(chunk_results['successful_tokens'])
+                results['failed_tokens'].extend(chunk_results['failed_tokens'])
+
+        in_flight: Dict[concurrent.futures.Future, int] = {}
+        offset = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for chunk in token_chunks:
+                if len(in_flight) >= max_workers * 2:
+                    done, _ = concurrent.futures.wait(
+                        in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        merge(in_flight.pop(future), future.result())
+                future = executor.submit(
+                    self.send_multicast_batch, chunk, title, body, data, 1
+                )
+                in_flight[future] = offset
+                offset += len(chunk)
+            for future in concurrent.futures.as_completed(in_flight):
+                merge(in_flight[future], future.result())
+
+        return results
+
     def send_personalized_batch(self, token_messages: List[Dict], max_workers: int = 5) -> Dict:
         """
         Send different messages to different tokens using threading
@@ -218,66 +473,203 @@ if not firebase_admin._apps:
     cred = credentials.Certificate(FIREBASE_CRED_PATH)
     firebase_admin.initialize_app(cred)
 
-@router.post("/send-notification")
-def send_notification_to_all(
-    req: PushNotification,
-    db: Session = Depends(get_db)
-):
+def _audience_query(stmt, service: str):
+    stmt = (
+        stmt.select_from(PushToken)
+        .join(ActiveUser, ActiveUser.phone_number == PushToken.user_id)
+        .where(ActiveUser.service_active_date >= plan_today())
+    )
+    if service != "all":
+        stmt = stmt.where(ActiveUser.service == service)
+    return stmt
+
+
+def count_audience(db: Session, service: str) -> int:
+    """Number of push tokens iter_audience_tokens would yield for `service`."""
+    return db.execute(_audience_query(select(func.count()), service)).scalar_one()
+
+
+def iter_audience_tokens(db: Session, service: str,
+                         chunk_size: int = FCMBatchSender.MULTICAST_LIMIT) -> Iterator[List[str]]:
     """
-    Sends push notifications to all users of a specific service
-    whose service_active_date is today or later.
+    Push tokens of every user of `service` ("all" = every service) whose
+    service_active_date is today or later, as one push_tokens ⨝ active_users
+    query streamed through a server-side cursor in chunks of `chunk_size`.
+    active_users is the nightly summary of user_details, so broadcasts no
+    longer scan user_details.
     """
-    # 1. Determine today's date
-    today = date.today()
-    today_str = today.strftime('%Y-%m-%d')
-
-    # 2. Fetch all eligible users
-    if req.service == "all":
-        users = (
-            db.query(UserDetails)
-            .filter(UserDetails.service_active_date >= today_str)
-            .all()
+    stmt = _audience_query(select(PushToken.token), service)
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=chunk_size))
+    for partition in result.scalars().partitions(chunk_size):
+        yield list(partition)
+
+
+# keep at most this many per-token failures on a job for the status endpoint
+JOB_FAILURE_SAMPLE = 100
+
+
+def run_notification_job(job_id: str, token_chunks: Iterable[List[str]] = None):
+    """
+    Background body of POST /send-notification: streams the audience, sends,
+    and writes progress to the notification_jobs row after every chunk.
+
+    `token_chunks` lets a caller supply an already-computed audience (the
+    scheduler pre-warms it) instead of querying it here.
+    """
+    db = SessionLocal()          # holds the streaming audience cursor
+    progress_db = SessionLocal() # progress commits must not close that cursor
+    try:
+        job = progress_db.get(NotificationJob, job_id)
+        if job is None:
+            return
+        if token_chunks is not None:
+            token_chunks = list(token_chunks)
+            job.total = sum(len(chunk) for chunk in token_chunks)
+        else:
+            job.total = count_audience(db, job.service)
+        job.status = "running"
+        job.started_at = job.heartbeat_at = datetime.now(timezone.utc)
+        progress_db.commit()
+
+        def on_chunk(chunk_results: Dict):
+            job.heartbeat_at = datetime.now(timezone.utc)
+            job.success_count += chunk_results['success_count']
+            job.failure_count += chunk_results['failure_count']
+            failures = list(job.failures or [])
+            for result in chunk_results['responses']:
+                if len(failures) >= JOB_FAILURE_SAMPLE:
+                    break
+                if not result['success']:
+                    failures.append({'token': result['token'], 'error': result['error'],
+                                     'error_kind': result['error_kind']})
+            job.failures = failures
+            progress_db.commit()
+
+        sender = FCMBatchSender()
+        results = sender.send_multicast_stream(
+            token_chunks if token_chunks is not None else iter_audience_tokens(db, job.service),
+            title=job.title,
+            body=job.body,
+            data={
+                "job_id": job.id,
+                "method": "multicast_batch",
+                "timestamp": str(int(time.time()))
+            },
+            on_chunk=on_chunk,
+            keep_responses=False,
+        )
+        db.close()
+
+        job.pruned_count = prune_dead_tokens(progress_db, results['dead_tokens'])
+        job.status = "completed"
+        job.finished_at = datetime.now(timezone.utc)
+        progress_db.commit()
+    except Exception as e:
+        progress_db.rollback()
+        progress_db.query(NotificationJob).filter(NotificationJob.id == job_id).update(
+            {"status": "failed", "error": str(e), "finished_at": datetime.now(timezone.utc)},
+            synchronize_session=False,
         )
-    else:
-        users = (
-            db.query(UserDetails)
+        progress_db.commit()
+    finally:
+        db.close()
+        progress_db.close()
+
+
+def fail_orphaned_jobs():
+    """
+    Jobs run in-process, so a deploy or crash leaves their rows 'queued' /
+    'running' for good. Mark as failed every running job whose heartbeat has
+    stopped, and every queued job that never started, for longer than
+    NOTIFICATION_JOB_STALE_MINUTES. Safe to run from every worker: live jobs
+    keep their heartbeat fresh.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=NOTIFICATION_JOB_STALE_MINUTES)
+    db = SessionLocal()
+    try:
+        reaped = (
+            db.query(NotificationJob)
             .filter(
-                UserDetails.service == req.service,
-                UserDetails.service_active_date >= today_str
+                or_(
+                    (NotificationJob.status == "running")
+                    & (func.coalesce(NotificationJob.heartbeat_at, NotificationJob.started_at) < cutoff),
+                    (NotificationJob.status == "queued") & (NotificationJob.created_at < cutoff),
+                )
+            )
+            .update(
+                {
+                    "status": "failed",
+                    "error": "Interrupted: the worker running this job stopped (restart or crash)",
+                    "finished_at": datetime.now(timezone.utc),
+                },
+                synchronize_session=False,
             )
-            .all()
         )
+        db.commit()
+        if reaped:
+            logger.warning(f"Marked {reaped} orphaned notification job(s) as failed")
+    finally:
+        db.close()
 
-    if not users:
-        raise HTTPException(status_code=404, detail="No active users found for this service.")
-
-    # 3. Extract phone numbers for token lookup
-    phone_numbers = [user.phone_number for user in users]
 
-    # 4. Fetch their push tokens
-    token_rows = (
-        db.query(PushToken.token)
-        .filter(PushToken.user_id.in_(phone_numbers))
-        .all()
-    )
-    tokens = [row[0] for row in token_rows]
-    if not tokens:
-        raise HTTPException(status_code=404, detail="No push tokens found for these users.")
-
-    sender = FCMBatchSender()
-
-    results1 = sender.send_individual_batch(
-        tokens=tokens,
-        title=req.msg_title,
-        body=req.msg_body,
-        data={
-            "test": "true",
-            "method": "individual_batch",
-            "timestamp": str(int(time.time()))
-        }
+def start_job_reaper():
+    """Called once the scheduler is running (main.py start-up)."""
+    scheduler.add_job(
+        fail_orphaned_jobs,
+        "interval",
+        minutes=1,
+        id="notification-job-reaper",
+        next_run_time=datetime.now(timezone.utc),
+        replace_existing=True,
+        coalesce=True,
     )
 
-    # 6. Return summary
+
+@router.post("/send-notification", status_code=202)
+def send_notification_to_all(
+    req: PushNotification,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """
+    Queues a push notification to all users of a specific service whose
+    service_active_date is today or later. Returns a job id at once; track
+    the broadcast with GET /notification/jobs/{job_id}.
+    """
+    job = NotificationJob(service=req.service, title=req.msg_title, body=req.msg_body)
+    db.add(job)
+    db.commit()
+
+    background_tasks.add_task(run_notification_job, job.id)
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.get("/jobs/{job_id}")
+def get_notification_job(job_id: str, db: Session = Depends(get_db)):
+    """Progress of a notification broadcast: counts, throughput and sample failures."""
+    job = db.get(NotificationJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Notification job not found")
+
+    processed = job.success_count + job.failure_count
+    throughput = None
+    if job.started_at:
+        end = job.finished_at or datetime.now(timezone.utc)
+        elapsed = (end - job.started_at).total_seconds()
+        throughput = round(processed / elapsed, 2) if elapsed > 0 else None
+
     return {
-        "responses": results1
+        "job_id": job.id,
+        "service": job.service,
+        "status": job.status,
+        "total": job.total,
+        "success_count": job.success_count,
+        "failure_count": job.failure_count,
+        "pruned_count": job.pruned_count,
+        "throughput_per_second": throughput,
+        "failures": job.failures or [],
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
     }
@@ -1,40 +1,176 @@
-from fastapi import APIRouter, Depends, HTTPException
-from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import date, timedelta
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+from cachetools import TTLCache
+from pydantic import BaseModel, Field
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
+from config import PLAN_STATUS_CACHE_TTL, PLAN_EXPIRY_SOON_DAYS
 from db.connection import get_db
-from db.models import UserDetails
+from db.models import ActiveUser, UserDetails
+from routes.Plan.active_users import expiring_soon_counts, plan_today
 
 router = APIRouter(prefix="/plan", tags=["plan"])
 
+# phone_number → (service, service_active_date). Per process; edit_user and
+# user deletion invalidate it, other workers catch up within the TTL.
+_plan_cache: TTLCache = TTLCache(maxsize=100_000, ttl=PLAN_STATUS_CACHE_TTL)
+_plan_lock = Lock()
+
+
+class BatchPlanCheck(BaseModel):
+    phone_numbers: List[str] = Field(..., min_length=1, max_length=1000)
+
+
+def _load_plan_statuses(db: Session, phones: Iterable[str]) -> Dict[str, Tuple[str, Optional[date]]]:
+    # projection: only the two columns the plan check needs
+    rows = (
+        db.query(UserDetails.phone_number, UserDetails.service, UserDetails.service_active_date)
+        .filter(UserDetails.phone_number.in_(list(phones)))
+        .all()
+    )
+    return {phone: (service, active_date) for phone, service, active_date in rows}
+
+
+def get_plan_statuses(db: Session, phones: Iterable[str]) -> Dict[str, Tuple[str, Optional[date]]]:
+    """(service, service_active_date) for every known phone; unknown phones are left out."""
+    found: Dict[str, Tuple[str, Optional[date]]] = {}
+    missing: List[str] = []
+    with _plan_lock:
+        for phone in dict.fromkeys(phones):
+            cached = _plan_cache.get(phone)
+            if cached is None:
+                missing.append(phone)
+            else:
+                found[phone] = cached
+    if missing:
+        loaded = _load_plan_statuses(db, missing)
+        with _plan_lock:
+            _plan_cache.update(loaded)
+        found.update(loaded)
+    return found
+
+
+def invalidate_plan_status(phone_number: str):
+    """Drop the cached plan status after the user's service / dates change."""
+    with _plan_lock:
+        _plan_cache.pop(phone_number, None)
+
+
+def _plan_response(service: str, active_date: Optional[date]) -> dict:
+    # NULL service_active_date means no plan was ever activated
+    if active_date is not None and active_date >= plan_today():
+        return {
+            "message": "✅ Your plan is active. Enjoy our services!",
+            "active": True,
+            "service": service
+        }
+    return {
+        "message": "⚠️ Your plan has expired. Please recharge to renew your access.",
+        "active": False,
+        "service": service
+    }
+
+
 @router.get(
     "/check-plan/{phone_number}",
     summary="Check user's service-plan status by phone number"
 )
 def check_plan(phone_number: str, db: Session = Depends(get_db)):
-    # 1. Fetch user
-    user = db.query(UserDetails).filter_by(phone_number=phone_number).first()
-    if not user:
+    status = get_plan_statuses(db, [phone_number]).get(phone_number)
+    if status is None:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    # 2. Parse stored date (assuming 'YYYY-MM-DD')
-    try:
-        active_date = date.fromisoformat(user.service_active_date)
-    except (TypeError, ValueError):
-        raise HTTPException(status_code=500, detail="Invalid service_active_date format")
-    
-    today = date.today()
-
-    # 3. Compare and return
-    if active_date >= today:
-        return {
-            "message": "✅ Your plan is active. Enjoy our services!",
-            "active": True,
-            "service": user.service
+    return _plan_response(*status)
+
+
+@router.post(
+    "/check-plan/batch",
+    summary="Check the service-plan status of many phone numbers at once"
+)
+def check_plan_batch(req: BatchPlanCheck, db: Session = Depends(get_db)):
+    """
+    Plan status for up to 1000 phone numbers, resolved in a single query
+    (cached entries aside). Unknown numbers are listed under `not_found`.
+    """
+    statuses = get_plan_statuses(db, req.phone_numbers)
+    results = {}
+    for phone, (service, active_date) in statuses.items():
+        results[phone] = {
+            **_plan_response(service, active_date),
+            "service_active_date": active_date,
         }
-    else:
-        return {
-            "message": "⚠️ Your plan has expired. Please recharge to renew your access.",
-            "active": False,
-            "service": user.service
+    return {
+        "results": results,
+        "not_found": [p for p in dict.fromkeys(req.phone_numbers) if p not in statuses],
+    }
+
+
+@router.get(
+    "/active-summary",
+    summary="Active users and upcoming expiries per service"
+)
+def active_summary(db: Session = Depends(get_db)):
+    """Counts from the active_users summary (rebuilt nightly), not from user_details."""
+    today = plan_today()
+    active = dict(
+        db.query(ActiveUser.service, func.count())
+        .filter(ActiveUser.service_active_date >= today)
+        .group_by(ActiveUser.service)
+        .all()
+    )
+    return {
+        "active": active,
+        "expiring_within_days": PLAN_EXPIRY_SOON_DAYS,
+        "expiring": expiring_soon_counts(db, PLAN_EXPIRY_SOON_DAYS),
+        "refreshed_on": db.query(func.max(ActiveUser.refreshed_on)).scalar(),
+    }
+
+
+@router.get(
+    "/expiring",
+    summary="Users whose plan expires soon"
+)
+def expiring_users(
+    within_days: int = Query(PLAN_EXPIRY_SOON_DAYS, ge=0, le=60),
+    service: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """
+    Users whose plan ends between today and `within_days` from now, soonest
+    first – for renewal reminders. Read from the active_users summary.
+    """
+    today = plan_today()
+    q = (
+        db.query(
+            ActiveUser.phone_number,
+            ActiveUser.service,
+            ActiveUser.service_active_date,
+            UserDetails.name,
+            UserDetails.email,
+        )
+        .join(UserDetails, UserDetails.phone_number == ActiveUser.phone_number)
+        .filter(ActiveUser.service_active_date.between(today, today + timedelta(days=within_days)))
+    )
+    if service:
+        q = q.filter(ActiveUser.service == service)
+    rows = (
+        q.order_by(ActiveUser.service_active_date, ActiveUser.phone_number)
+         .offset(skip)
+         .limit(limit)
+         .all()
+    )
+    return [
+        {
+            "phone_number": r.phone_number,
+            "name": r.name,
+            "email": r.email,
+            "service": r.service,
+            "service_active_date": r.service_active_date,
+            "days_left": (r.service_active_date - today).days,
         }
+        for r in rows
+    ]
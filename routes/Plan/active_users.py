@@ -0,0 +1,115 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+from zoneinfo import ZoneInfo
+
+from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from config import logger, NOTIFICATION_TIMEZONE, PLAN_SUMMARY_REFRESH_CRON, PLAN_EXPIRY_SOON_DAYS
+from db.connection import SessionLocal
+from db.models import ActiveUser, UserDetails
+from scheduler import scheduler
+
+# pg advisory lock key for the rebuild, so only one worker runs it at a time
+ACTIVE_USERS_LOCK_KEY = 50_021_001
+
+_PLAN_TZ = ZoneInfo(NOTIFICATION_TIMEZONE)
+
+
+def plan_today() -> date:
+    """
+    Today's date where plans are sold. service_active_date is a calendar
+    date in NOTIFICATION_TIMEZONE; the server clock may be UTC, which
+    would keep an expired plan alive until 05:30 IST.
+    """
+    return datetime.now(_PLAN_TZ).date()
+
+
+def sync_active_user(db: Session, phone_number: str, service: str, active_date: Optional[date]):
+    """
+    Mirror one user's plan into active_users on the caller's session
+    (committed with the caller's own changes).
+    """
+    db.flush()  # the user_details row must exist before the FK'd upsert
+    if active_date is None or active_date < plan_today():
+        db.execute(delete(ActiveUser).where(ActiveUser.phone_number == phone_number))
+        return
+    stmt = pg_insert(ActiveUser).values(
+        phone_number=phone_number, service=service, service_active_date=active_date
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[ActiveUser.phone_number],
+            set_={"service": stmt.excluded.service, "service_active_date": stmt.excluded.service_active_date},
+        )
+    )
+
+
+def expiring_soon_counts(db: Session, within_days: int) -> Dict[str, int]:
+    today = plan_today()
+    rows = (
+        db.query(ActiveUser.service, func.count())
+        .filter(ActiveUser.service_active_date.between(today, today + timedelta(days=within_days)))
+        .group_by(ActiveUser.service)
+        .all()
+    )
+    return dict(rows)
+
+
+def refresh_active_users():
+    """
+    Nightly rebuild of active_users from user_details. Every worker schedules
+    it; the advisory lock plus the refreshed_on check make the first one do
+    the work and the rest skip.
+    """
+    today = plan_today()
+    db = SessionLocal()
+    try:
+        locked = db.execute(select(func.pg_try_advisory_xact_lock(ACTIVE_USERS_LOCK_KEY))).scalar()
+        if not locked:
+            db.rollback()
+            return
+        if db.query(func.max(ActiveUser.refreshed_on)).scalar() == today:
+            db.rollback()
+            return
+
+        db.execute(delete(ActiveUser))
+        inserted = db.execute(
+            insert(ActiveUser).from_select(
+                ["phone_number", "service", "service_active_date", "refreshed_on"],
+                select(
+                    UserDetails.phone_number,
+                    UserDetails.service,
+                    UserDetails.service_active_date,
+                    literal(today),
+                ).where(UserDetails.service_active_date >= today),
+            )
+        ).rowcount
+        db.commit()
+
+        expiring = expiring_soon_counts(db, PLAN_EXPIRY_SOON_DAYS)
+        logger.info(
+            f"Active-user summary rebuilt: {inserted} active user(s); "
+            f"expiring within {PLAN_EXPIRY_SOON_DAYS} day(s): {expiring or 'none'}"
+        )
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Active-user summary rebuild failed: {e}", exc_info=True)
+    finally:
+        db.close()
+
+
+def start_plan_jobs():
+    """Called once the scheduler is running (main.py start-up)."""
+    scheduler.add_job(
+        refresh_active_users,
+        CronTrigger.from_crontab(PLAN_SUMMARY_REFRESH_CRON, timezone=NOTIFICATION_TIMEZONE),
+        id="plan-active-users-refresh",
+        replace_existing=True,
+        coalesce=True,
+        misfire_grace_time=3600,
+    )
+    # build today's summary now if the nightly run has not happened yet
+    scheduler.add_job(refresh_active_users, id="plan-active-users-initial", replace_existing=True)
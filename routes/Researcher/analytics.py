@@ -0,0 +1,57 @@
+from fastapi import APIRouter, HTTPException
+from typing import List
+import numpy as np
+
+from db.schema import OptionPricingRequest, OptionPricingOut
+from routes.Researcher import option_pricing
+
+router = APIRouter(prefix="/researcher/analytics", tags=["researcher"])
+
+GREEKS = ("price", "delta", "gamma", "vega", "theta", "rho")
+
+
+def _column(values) -> List:
+    return [None if not np.isfinite(v) else float(v) for v in values]
+
+
+@router.post("/greeks", response_model=List[OptionPricingOut])
+def option_greeks(req: OptionPricingRequest):
+    """
+    Implied volatility and Greeks for a batch of strikes, priced together
+    with vectorized Black–Scholes (mibian conventions: rates and
+    volatilities in percent, days to expiry, vega/rho per 1 %, theta per day).
+
+    Rows with a `volatility` are priced at it; rows with only a market
+    `price` have their implied volatility solved first.
+    """
+    rows = req.options
+    missing = [i for i, o in enumerate(rows) if o.volatility is None and o.price is None]
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Rows {missing[:20]} need either 'price' or 'volatility'.",
+        )
+
+    underlying = np.array([o.underlying for o in rows])
+    strike = np.array([o.strike for o in rows])
+    days = np.array([o.days_to_expiry for o in rows])
+    rate = np.array([o.interest_rate for o in rows])
+    is_call = np.array([o.option_type == "Call" for o in rows])
+    given_vol = np.array([np.nan if o.volatility is None else o.volatility for o in rows])
+    market_price = np.array([np.nan if o.price is None else o.price for o in rows])
+
+    # solve IV only where no volatility was supplied
+    solve = np.isnan(given_vol)
+    volatility = given_vol.copy()
+    if solve.any():
+        volatility[solve] = option_pricing.implied_volatility(
+            market_price[solve], underlying[solve], strike[solve], rate[solve], days[solve], is_call[solve]
+        )
+
+    results = option_pricing.greeks(underlying, strike, rate, days, volatility, is_call)
+    columns = {name: _column(np.broadcast_to(results[name], volatility.shape)) for name in GREEKS}
+    columns["implied_volatility"] = _column(volatility)
+    return [
+        {name: values[i] for name, values in columns.items()}
+        for i in range(len(rows))
+    ]
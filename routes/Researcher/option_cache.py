@@ -0,0 +1,102 @@
+from collections import defaultdict
+from threading import Lock
+from typing import Callable, Dict, Iterable
+
+from cachetools import TTLCache
+
+from config import logger, REDIS_HOST, REDIS_PORT, RESEARCHER_CACHE_TTL
+
+try:
+    import redis
+except ImportError:  # redis is optional; fall back to a per-process cache
+    redis = None
+
+# namespace of the unfiltered GET /researcher/ listing
+ALL_OPTIONS = "_all"
+
+
+class OptionListCache:
+    """
+    Pre-serialized JSON bodies of the researcher option lists.
+
+    Entries live under a namespace (a service name, or ALL_OPTIONS) and a
+    generation number. The write endpoints `invalidate` the namespaces they
+    touch, which bumps the generation: every worker then misses on its next
+    read. A body computed while a write was in flight is stored under the
+    old generation, where nobody looks for it any more.
+
+    With REDIS_HOST set, bodies and generations live in Redis and are shared
+    by all workers. Otherwise they are kept in this process; entries also
+    expire after `ttl` seconds as a safety net.
+    """
+
+    PREFIX = "researcher:cache:"
+
+    def __init__(self, ttl: int = 300, client=None):
+        self.ttl = ttl
+        self.redis = client
+        self._local: TTLCache = TTLCache(maxsize=1024, ttl=ttl)
+        self._generations: Dict[str, int] = defaultdict(int)
+        self._lock = Lock()
+
+    # ── redis ──
+    def _redis_get(self, namespace: str, key: str) -> tuple:
+        gen = int(self.redis.get(f"{self.PREFIX}gen:{namespace}") or 0)
+        return gen, self.redis.hget(f"{self.PREFIX}{namespace}", f"{gen}:{key}")
+
+    def _redis_set(self, namespace: str, key: str, gen: int, body: bytes):
+        name = f"{self.PREFIX}{namespace}"
+        pipe = self.redis.pipeline()
+        pipe.hset(name, f"{gen}:{key}", body)
+        pipe.expire(name, self.ttl)
+        pipe.execute()
+
+    # ── public API ──
+    def get_or_load(self, namespace: str, key: str, loader: Callable[[], bytes]) -> bytes:
+        if self.redis is not None:
+            try:
+                gen, body = self._redis_get(namespace, key)
+            except Exception as exc:
+                logger.warning(f"Researcher cache read failed ({exc}); querying the DB")
+                return loader()
+            if body is None:
+                body = loader()
+                try:
+                    self._redis_set(namespace, key, gen, body)
+                except Exception as exc:
+                    logger.warning(f"Researcher cache write failed: {exc}")
+            return body
+
+        with self._lock:
+            gen = self._generations[namespace]
+            body = self._local.get((namespace, gen, key))
+        if body is None:
+            body = loader()
+            with self._lock:
+                self._local[(namespace, gen, key)] = body
+        return body
+
+    def invalidate(self, namespaces: Iterable[str]):
+        namespaces = set(namespaces) | {ALL_OPTIONS}
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline()
+                for ns in namespaces:
+                    pipe.incr(f"{self.PREFIX}gen:{ns}")
+                    pipe.delete(f"{self.PREFIX}{ns}")
+                pipe.execute()
+            except Exception as exc:
+                logger.error(f"Researcher cache invalidation failed: {exc}")
+            return
+        with self._lock:
+            for ns in namespaces:
+                self._generations[ns] += 1
+
+
+def _redis_client():
+    if REDIS_HOST and redis is not None:
+        return redis.Redis(host=REDIS_HOST, port=int(REDIS_PORT or 6379))
+    return None
+
+
+option_cache = OptionListCache(ttl=RESEARCHER_CACHE_TTL, client=_redis_client())
@@ -0,0 +1,155 @@
+"""
+Vectorized Black–Scholes pricing, Greeks and implied volatility.
+
+Every function takes NumPy arrays (or scalars, broadcast together) and
+works on a whole batch of strikes at once. Inputs and outputs follow the
+mibian conventions the researchers are used to:
+
+    underlying, strike   – prices
+    interest_rate        – annual rate in percent (7 → 7 %)
+    days                 – calendar days to expiry
+    volatility           – annual volatility in percent (18 → 18 %)
+    vega / rho           – change per 1 % move of volatility / rate
+    theta                – change per calendar day
+"""
+import math
+
+import numpy as np
+
+_SQRT_2 = math.sqrt(2.0)
+_SQRT_2PI = math.sqrt(2.0 * math.pi)
+
+MIN_VOLATILITY = 0.01   # percent
+MAX_VOLATILITY = 500.0  # percent
+
+# relative precision of a computed price; a volatility is only solved for when
+# vega is large enough for that rounding to move it by less than `tol`
+_PRICE_RESOLUTION = 1e-12
+
+
+def _erf(x: np.ndarray) -> np.ndarray:
+    # Abramowitz & Stegun 7.1.26, |error| < 1.5e-7 – plenty for option prices
+    sign = np.sign(x)
+    x = np.abs(x)
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return sign * (1.0 - poly * np.exp(-x * x))
+
+
+def norm_cdf(x: np.ndarray) -> np.ndarray:
+    return 0.5 * (1.0 + _erf(x / _SQRT_2))
+
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * x * x) / _SQRT_2PI
+
+
+def _prepare(underlying, strike, interest_rate, days, volatility):
+    s = np.asarray(underlying, dtype=float)
+    k = np.asarray(strike, dtype=float)
+    r = np.asarray(interest_rate, dtype=float) / 100.0
+    t = np.asarray(days, dtype=float) / 365.0
+    sigma = np.asarray(volatility, dtype=float) / 100.0
+    sqrt_t = np.sqrt(t)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1 = (np.log(s / k) + (r + 0.5 * sigma * sigma) * t) / (sigma * sqrt_t)
+    d2 = d1 - sigma * sqrt_t
+    return s, k, r, t, sigma, sqrt_t, d1, d2
+
+
+def price(underlying, strike, interest_rate, days, volatility, is_call) -> np.ndarray:
+    s, k, r, t, _, _, d1, d2 = _prepare(underlying, strike, interest_rate, days, volatility)
+    discounted_k = k * np.exp(-r * t)
+    call = s * norm_cdf(d1) - discounted_k * norm_cdf(d2)
+    put = discounted_k * norm_cdf(-d2) - s * norm_cdf(-d1)
+    return np.where(is_call, call, put)
+
+
+def greeks(underlying, strike, interest_rate, days, volatility, is_call) -> dict:
+    """Price, delta, gamma, vega, theta and rho for every row."""
+    s, k, r, t, sigma, sqrt_t, d1, d2 = _prepare(underlying, strike, interest_rate, days, volatility)
+    pdf_d1 = norm_pdf(d1)
+    cdf_d1, cdf_d2 = norm_cdf(d1), norm_cdf(d2)
+    cdf_neg_d1, cdf_neg_d2 = norm_cdf(-d1), norm_cdf(-d2)
+    discounted_k = k * np.exp(-r * t)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gamma = pdf_d1 / (s * sigma * sqrt_t)
+        decay = -s * pdf_d1 * sigma / (2.0 * sqrt_t)
+
+    return {
+        "price": np.where(is_call, s * cdf_d1 - discounted_k * cdf_d2, discounted_k * cdf_neg_d2 - s * cdf_neg_d1),
+        "delta": np.where(is_call, cdf_d1, cdf_d1 - 1.0),
+        "gamma": gamma,
+        "vega": s * pdf_d1 * sqrt_t / 100.0,
+        "theta": np.where(
+            is_call,
+            decay - r * discounted_k * cdf_d2,
+            decay + r * discounted_k * cdf_neg_d2,
+        ) / 365.0,
+        "rho": np.where(is_call, k * t * np.exp(-r * t) * cdf_d2, -k * t * np.exp(-r * t) * cdf_neg_d2) / 100.0,
+    }
+
+
+def implied_volatility(
+    option_price,
+    underlying,
+    strike,
+    interest_rate,
+    days,
+    is_call,
+    tol: float = 1e-4,
+    max_iter: int = 50,
+) -> np.ndarray:
+    """
+    Annual volatility (percent) reproducing `option_price`, for every row at once.
+
+    Safeguarded Newton: each row keeps a [low, high] bracket; a Newton step
+    that leaves the bracket (or a vanishing vega) falls back to bisection.
+    A row has converged once its Newton step, price error / vega, is below
+    `tol` volatility points – a test on the volatility itself, so it holds
+    for a 3600 deep-ITM premium as well as a 0.05 far-OTM one.
+
+    NaN is returned where the volatility cannot be recovered: prices outside
+    the no-arbitrage bounds, rows whose vega is ~0 (the price carries no
+    time value to invert, e.g. deep ITM/OTM close to expiry) and rows still
+    unconverged after `max_iter` iterations.
+    """
+    target, s, k, r, t, is_call = np.broadcast_arrays(
+        np.asarray(option_price, dtype=float),
+        np.asarray(underlying, dtype=float),
+        np.asarray(strike, dtype=float),
+        np.asarray(interest_rate, dtype=float),
+        np.asarray(days, dtype=float),
+        np.asarray(is_call, dtype=bool),
+    )
+
+    discounted_k = k * np.exp(-(r / 100.0) * (t / 365.0))
+    lower_bound = np.where(is_call, np.maximum(s - discounted_k, 0.0), np.maximum(discounted_k - s, 0.0))
+    upper_bound = np.where(is_call, s, discounted_k)
+    valid = (target > lower_bound) & (target < upper_bound) & (t > 0)
+
+    low = np.full(target.shape, MIN_VOLATILITY)
+    high = np.full(target.shape, MAX_VOLATILITY)
+    vol = np.full(target.shape, 30.0)
+    converged = np.zeros(target.shape, dtype=bool)
+
+    for _ in range(max_iter):
+        g = greeks(s, k, r, t, vol, is_call)
+        diff = g["price"] - target
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            step = diff / g["vega"]  # vega is per 1 % of volatility
+        # with a vega of ~0 the price no longer pins the volatility down
+        resolvable = g["vega"] * tol > _PRICE_RESOLUTION * np.maximum(s, k)
+        converged = converged | (valid & resolvable & (np.abs(step) < tol))
+        active = valid & ~converged
+        if not active.any():
+            break
+        # tighten the bracket: price is increasing in volatility
+        high = np.where(active & (diff > 0), vol, high)
+        low = np.where(active & (diff < 0), vol, low)
+        newton = vol - step
+        in_bracket = np.isfinite(newton) & (newton > low) & (newton < high)
+        vol = np.where(active, np.where(in_bracket, newton, 0.5 * (low + high)), vol)
+
+    return np.where(converged, vol, np.nan)
@@ -0,0 +1,188 @@
+import asyncio
+import re
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from config import logger, REDIS_HOST, REDIS_PORT
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional; fall back to in-process delivery
+    aioredis = None
+
+# handler(service, framed_message)
+Handler = Callable[[str, str], Awaitable[None]]
+# on_reset(service) – drop what is buffered for `service` (None: every service)
+ResetHandler = Callable[[Optional[str]], Awaitable[None]]
+
+CHANNEL_PREFIX = "researcher:options:"
+SEQUENCE_PREFIX = "researcher:seq:"
+RESET_PREFIX = "researcher:reset:"
+
+# Number and publish in one step, so messages leave Redis in seq order
+# whichever worker wrote them. INCR returning 1 means the counter was
+# (re)created – Redis flushed or the key expired – so listeners are told to
+# drop what they buffered under the previous numbering first.
+_PUBLISH_SCRIPT = """
+local seq = redis.call('INCR', KEYS[1])
+if seq == 1 then
+    redis.call('PUBLISH', KEYS[3], '')
+end
+local data = ARGV[1]
+local msg
+if data == '{}' then
+    msg = '{"seq":' .. seq .. '}'
+else
+    msg = '{"seq":' .. seq .. ',' .. string.sub(data, 2)
+end
+redis.call('PUBLISH', KEYS[2], msg)
+return seq
+"""
+
+
+_SEQ_PREFIX = re.compile(r'^\{"seq":\s*(\d+)')
+
+
+def seq_of(data: str) -> Optional[int]:
+    """Sequence number of a framed message (None for unsequenced ones)."""
+    m = _SEQ_PREFIX.match(data)
+    return int(m.group(1)) if m else None
+
+
+def frame(seq: Optional[int], data: str) -> str:
+    """Prefix a serialized JSON object with its per-service sequence number."""
+    if seq is None:
+        return data
+    return f'{{"seq":{seq},{data[1:]}' if data != "{}" else f'{{"seq":{seq}}}'
+
+
+class InProcessBroker:
+    """
+    Stand-in used when Redis is not configured (single worker / local dev):
+    a publish is numbered from a local counter and delivered straight to
+    this process's handler.
+    """
+
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+        self._seq: Dict[str, int] = defaultdict(int)
+
+    async def start(self, handler: Handler, on_reset: Optional[ResetHandler] = None):
+        self._handler = handler
+
+    async def stop(self):
+        self._handler = None
+
+    async def publish(self, service: str, data: str):
+        self._seq[service] += 1
+        if self._handler is not None:
+            await self._handler(service, frame(self._seq[service], data))
+
+
+class RedisBroker:
+    """
+    Relays researcher updates between uvicorn workers over Redis pub/sub.
+
+    Every worker publishes to `researcher:options:<service>` and listens on
+    `researcher:options:*`, handing each message to its local
+    ConnectionManager – so a call created on worker A reaches sockets held
+    by worker B. Messages are numbered per service by a script that INCRs
+    `researcher:seq:<service>` and publishes atomically.
+
+    A message on `researcher:reset:<service>` tells every worker that seqs
+    of that service can no longer be trusted (counter restarted, or a
+    publish was lost) and its subscribers must resync. A worker whose own
+    subscription dropped resets every service, since it may have missed
+    messages meanwhile.
+    """
+
+    def __init__(self, host: str, port: int, prefix: str = CHANNEL_PREFIX):
+        self.prefix = prefix
+        self.redis = aioredis.Redis(host=host, port=port, decode_responses=True)
+        self._publish_script = self.redis.register_script(_PUBLISH_SCRIPT)
+        self._handler: Optional[Handler] = None
+        self._on_reset: Optional[ResetHandler] = None
+        self._listener: Optional[asyncio.Task] = None
+        # services whose update could not be published; announced once Redis is back
+        self._unannounced: Set[str] = set()
+
+    async def start(self, handler: Handler, on_reset: Optional[ResetHandler] = None):
+        self._handler = handler
+        self._on_reset = on_reset
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self.redis.close()
+
+    async def _reset(self, service: Optional[str]):
+        if self._on_reset is not None:
+            await self._on_reset(service)
+
+    async def _listen(self):
+        subscribed_before = False
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.psubscribe(f"{self.prefix}*", f"{RESET_PREFIX}*")
+                if subscribed_before:
+                    # messages published while we were away are lost to us
+                    await self._reset(None)
+                subscribed_before = True
+                await self._announce_resets()
+                async for msg in pubsub.listen():
+                    if msg.get("type") != "pmessage":
+                        continue
+                    channel = msg["channel"]
+                    try:
+                        if channel.startswith(RESET_PREFIX):
+                            await self._reset(channel[len(RESET_PREFIX):])
+                        else:
+                            await self._handler(channel[len(self.prefix):], msg["data"])
+                    except Exception as exc:
+                        logger.error(f"Researcher relay handler failed: {exc}", exc_info=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning(f"Researcher pub/sub connection lost ({exc}); resubscribing")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+    async def _announce_resets(self):
+        for service in list(self._unannounced):
+            await self.redis.publish(f"{RESET_PREFIX}{service}", "")
+            self._unannounced.discard(service)
+
+    async def publish(self, service: str, data: str):
+        try:
+            await self._announce_resets()
+            await self._publish_script(
+                keys=[f"{SEQUENCE_PREFIX}{service}", f"{self.prefix}{service}", f"{RESET_PREFIX}{service}"],
+                args=[data],
+            )
+        except Exception as exc:
+            # Redis unavailable: the update is committed but no worker relays
+            # it. Resync this worker's subscribers from the database now, and
+            # the other workers' as soon as Redis accepts the reset.
+            logger.error(f"Researcher publish to Redis failed ({exc}); resetting {service} subscribers")
+            self._unannounced.add(service)
+            await self._reset(service)
+
+
+def create_broker():
+    if REDIS_HOST and aioredis is not None:
+        return RedisBroker(REDIS_HOST, int(REDIS_PORT or 6379))
+    if REDIS_HOST:
+        logger.warning("REDIS_HOST is set but the redis package is missing; researcher feed is per-process")
+    return InProcessBroker()
@@ -1,34 +1,344 @@
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, HTTPException
-from typing import List, Dict
-from collections import defaultdict
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, HTTPException, Query, Response, Header
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import OAuth2PasswordBearer
+from datetime import datetime
+from pydantic import TypeAdapter
+from sqlalchemy import func, tuple_
+from typing import Awaitable, Callable, Deque, List, Dict, Iterable, Optional, Tuple, Union
+from collections import defaultdict, deque
 from sqlalchemy.orm import Session
-from db.connection import get_db
+from db.connection import get_db, SessionLocal
 from db.schema import OptionOut, OptionCreate, OptionUpdate
 from db.models import Option, UserDetails
+from routes.Researcher.pubsub import create_broker, seq_of
+from routes.Researcher.option_cache import option_cache, ALL_OPTIONS
+from routes.auth.JWTSecurity import verify_token
+from config import (
+    logger,
+    WS_SEND_QUEUE_SIZE,
+    WS_SEND_TIMEOUT,
+    WS_REPLAY_BUFFER_SIZE,
+    WS_PING_INTERVAL,
+    WS_MAX_CONNECTIONS_PER_SERVICE,
+)
+import asyncio
 import json
+import re
 
 router = APIRouter(prefix="/researcher", tags=["researcher"])
 
-# --- Connection manager for WebSockets, grouped by service ---
+# the bearer token is optional: it only saves the user lookup on the feed
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
+
+# --- Connection manager for WebSockets / SSE streams, grouped by service ---
+class Subscriber:
+    """
+    One live connection: a bounded outbox drained by its own writer task
+    (WebSocket) or by the response generator (SSE stream, `websocket` None).
+    """
+
+    def __init__(self, service: str, queue_size: int, websocket: Optional[WebSocket] = None):
+        self.websocket = websocket
+        self.service = service
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+
+    @property
+    def key(self):
+        return self.websocket if self.websocket is not None else self
+
+    def end_stream(self):
+        """Wake the SSE generator and make it finish; queued messages are dropped."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
 class ConnectionManager:
-    def __init__(self):
-        # service_name → list of WebSocket connections
-        self.active_connections: Dict[str, List[WebSocket]] = defaultdict(list)
+    """
+    Fan-out of researcher updates to WebSocket and SSE subscribers.
+
+    A broadcast serializes the message once and only enqueues it on every
+    subscriber's bounded queue; each connection has its own writer task, so
+    sends happen concurrently and one slow socket never delays the others.
+    A subscriber whose queue is full (or whose send times out / fails) is
+    evicted; the client reconnects.
+
+    Every message carries a per-service `seq`. The last `replay_size`
+    messages of each service are kept, so a client reconnecting with the
+    last seq it saw gets just the messages it missed; when the gap is
+    older than the buffer it gets a `resync` snapshot instead. When the
+    broker reports that a service's seqs can no longer be trusted, its
+    buffer is dropped and its subscribers are closed with 1012, so they
+    reconnect and resync.
+
+    WebSocket liveness is left to the protocol: uvicorn sends ping frames
+    and closes a socket whose pong does not come back, which clears out
+    half-open mobile sockets without anything in the data stream. SSE has
+    no such frames, so a heartbeat task queues a keep-alive comment on
+    every stream each `heartbeat_interval`; a dead stream fails that write.
+    At most `max_per_service` connections per service are accepted; beyond
+    that a socket is closed with 1013 (try again later).
+    """
+
+    # queued on SSE streams only; written as a comment, never as an event
+    HEARTBEAT = ": ping\n\n"
+
+    def __init__(
+        self,
+        queue_size: int = 100,
+        send_timeout: float = 10.0,
+        replay_size: int = 500,
+        heartbeat_interval: float = 30.0,
+        max_per_service: int = 5000,
+    ):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.replay_size = replay_size
+        self.heartbeat_interval = heartbeat_interval
+        self.max_per_service = max_per_service
+        self._heartbeat: Optional[asyncio.Task] = None
+        # reason → connections closed by the server (since start-up)
+        self.evictions: Dict[str, int] = defaultdict(int)
+        self.rejected = 0
+        # service_name → {WebSocket (or the Subscriber itself for SSE): Subscriber}
+        self.active_connections: Dict[str, Dict[object, Subscriber]] = defaultdict(dict)
+        # service_name → recent (seq, framed message), oldest first
+        self.history: Dict[str, Deque[Tuple[int, str]]] = defaultdict(lambda: deque(maxlen=self.replay_size))
+        # service_name → highest seq seen by this process
+        self.last_seq: Dict[str, int] = {}
+
+    def missed_since(self, service: str, since: int) -> Optional[List[str]]:
+        """
+        Buffered messages of `service` newer than `since`, or None when they
+        cannot all be served from memory (gap older than the buffer, counter
+        reset, or too many to queue).
+        """
+        last = self.last_seq.get(service)
+        if last is None or since > last:
+            # nothing seen since this process started, or the counter was reset
+            return None
+        if since == last:
+            return []
+        history = self.history.get(service)
+        if not history or history[0][0] > since + 1:
+            return None
+        missed = [data for seq, data in history if seq > since]
+        if len(missed) >= self.queue_size:
+            return None
+        return missed
+
+    # ── heartbeat ───────────────────────────────────────────────────────
+    def start(self):
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._run_heartbeat())
+
+    async def stop(self):
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat = None
+
+    async def _run_heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                self._beat()
+            except Exception as exc:
+                logger.error(f"Researcher heartbeat error: {exc}", exc_info=True)
+
+    def _beat(self):
+        for service, subs in list(self.active_connections.items()):
+            for sub in list(subs.values()):
+                if sub.websocket is not None:
+                    continue
+                try:
+                    sub.queue.put_nowait(self.HEARTBEAT)
+                except asyncio.QueueFull:
+                    self._schedule_evict(sub, code=1013, reason="slow")
+
+    def stats(self) -> dict:
+        """Connection gauges for this worker process."""
+        connections = {svc: len(subs) for svc, subs in self.active_connections.items()}
+        return {
+            "connections": connections,
+            "total": sum(connections.values()),
+            "max_per_service": self.max_per_service,
+            "rejected": self.rejected,
+            "evictions": dict(self.evictions),
+        }
 
-    async def connect(self, websocket: WebSocket, service: str):
+    def _at_cap(self, service: str) -> bool:
+        if len(self.active_connections.get(service, {})) < self.max_per_service:
+            return False
+        self.rejected += 1
+        logger.warning(f"Researcher feed for {service} is at its cap of {self.max_per_service} connections")
+        return True
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        service: str,
+        since: Optional[int] = None,
+        load_snapshot: Optional[Callable[[str], Awaitable[list]]] = None,
+    ) -> Optional[Subscriber]:
+        """Register the socket; returns None when the service is at its connection cap."""
         await websocket.accept()
-        self.active_connections[service].append(websocket)
+        if self._at_cap(service):
+            await websocket.close(code=1013)
+            return None
+        sub = Subscriber(service, self.queue_size, websocket=websocket)
+        await self._attach(sub, since, load_snapshot)
+        sub.writer = asyncio.create_task(self._writer(sub))
+        return sub
+
+    async def open_stream(
+        self,
+        service: str,
+        since: Optional[int] = None,
+        load_snapshot: Optional[Callable[[str], Awaitable[list]]] = None,
+    ) -> Optional[Subscriber]:
+        """Register an SSE subscriber (drained by the caller); None when at the cap."""
+        if self._at_cap(service):
+            return None
+        sub = Subscriber(service, self.queue_size)
+        await self._attach(sub, since, load_snapshot)
+        return sub
+
+    async def _attach(
+        self,
+        sub: Subscriber,
+        since: Optional[int],
+        load_snapshot: Optional[Callable[[str], Awaitable[list]]],
+    ):
+        service = sub.service
+        backlog: List[str] = []
+        if since is not None:
+            missed = self.missed_since(service, since)
+            if missed is None and load_snapshot is not None:
+                seq = self.last_seq.get(service, 0)
+                options = await load_snapshot(service)
+                backlog.append(json.dumps({"seq": seq, "action": "resync", "options": options}))
+                # whatever arrived while the snapshot was loading
+                missed = self.missed_since(service, seq)
+            backlog.extend(missed or [])
+
+        # no await between here and registration: nothing published meanwhile
+        # can slip between the replayed backlog and the live stream
+        for data in backlog:
+            sub.queue.put_nowait(data)
+        self.active_connections[service][sub.key] = sub
+
+    def disconnect(self, key, service: str):
+        """Unregister the subscriber stored under `key` (its WebSocket, or itself for SSE)."""
+        sub = self.active_connections.get(service, {}).pop(key, None)
+        if sub and sub.writer and sub.writer is not asyncio.current_task():
+            sub.writer.cancel()
+        if service in self.active_connections and not self.active_connections[service]:
+            del self.active_connections[service]
+
+    async def _writer(self, sub: Subscriber):
+        try:
+            while True:
+                data = await sub.queue.get()
+                await asyncio.wait_for(sub.websocket.send_text(data), self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.info(f"Dropping researcher subscriber on {sub.service}: {exc!r}")
+            await self._evict(sub, code=1011, reason="error")
+
+    def _schedule_evict(self, sub: Subscriber, code: int, reason: str):
+        logger.info(f"Evicting {reason} researcher subscriber on {sub.service}")
+        asyncio.create_task(self._evict(sub, code=code, reason=reason))
 
-    def disconnect(self, websocket: WebSocket, service: str):
-        if websocket in self.active_connections.get(service, []):
-            self.active_connections[service].remove(websocket)
+    async def _evict(self, sub: Subscriber, code: int, reason: str):
+        if sub.key not in self.active_connections.get(sub.service, {}):
+            return  # already gone
+        self.evictions[reason] += 1
+        self.disconnect(sub.key, sub.service)
+        if sub.websocket is None:
+            sub.end_stream()
+            return
+        try:
+            await sub.websocket.close(code=code)
+        except Exception:
+            pass
 
-    async def broadcast(self, message: dict, service: str):
+    def _remember(self, service: str, data: str) -> bool:
+        """Buffer a message in seq order; False if it is already buffered."""
+        seq = seq_of(data)
+        if seq is None:
+            return True
+        history = self.history[service]
+        last = self.last_seq.get(service)
+        if last is None or seq > last:
+            history.append((seq, data))
+            self.last_seq[service] = seq
+            return True
+        # Arrived late: slot it in behind the newer messages. A counter that
+        # restarted is announced by the broker (see `reset`), so a lower seq
+        # never means a new numbering here.
+        i = len(history)
+        while i and history[i - 1][0] > seq:
+            i -= 1
+        if i and history[i - 1][0] == seq:
+            return False
+        if len(history) == history.maxlen:
+            if i == 0:
+                return True  # older than the whole buffer
+            history.popleft()
+            i -= 1
+        history.insert(i, (seq, data))
+        return True
+
+    async def reset(self, service: Optional[str] = None):
+        """Forget the buffer of `service` (every service when None) and make its subscribers resync."""
+        services = [service] if service is not None else list(self.active_connections)
+        if service is None:
+            self.history.clear()
+            self.last_seq.clear()
+        for svc in services:
+            self.history.pop(svc, None)
+            self.last_seq.pop(svc, None)
+            for sub in list(self.active_connections.get(svc, {}).values()):
+                await self._evict(sub, code=1012, reason="reset")
+
+    async def deliver(self, service: str, data: str):
+        """Enqueue an already-serialized message for this process's subscribers of `service`."""
+        if not self._remember(service, data):
+            return
+        for sub in list(self.active_connections.get(service, {}).values()):
+            try:
+                sub.queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # slow consumer: cut it loose rather than buffer without bound
+                self._schedule_evict(sub, code=1013, reason="slow")
+
+    async def broadcast(self, message: dict, service: Union[str, Iterable[str]]):
+        """
+        Publish to every worker's subscribers of `service` (one name or a list):
+        serialized once, then relayed through the pub/sub broker, whose
+        listener in each process calls `deliver`.
+        """
         data = json.dumps(message)
-        for connection in self.active_connections.get(service, []):
-            await connection.send_text(data)
+        services = [service] if isinstance(service, str) else list(service)
+        for svc in services:
+            await broker.publish(svc, data)
 
-manager = ConnectionManager()
+manager = ConnectionManager(
+    queue_size=WS_SEND_QUEUE_SIZE,
+    send_timeout=WS_SEND_TIMEOUT,
+    replay_size=WS_REPLAY_BUFFER_SIZE,
+    heartbeat_interval=WS_PING_INTERVAL,
+    max_per_service=WS_MAX_CONNECTIONS_PER_SERVICE,
+)
+# cross-worker relay (Redis when REDIS_HOST is set); started in main.py
+broker = create_broker()
 
 # --- DB helpers ---
 def get_option(db: Session, option_id: int) -> Option:
@@ -38,7 +348,7 @@ def get_option(db: Session, option_id: int) -> Option:
     return opt
 
 def get_options(db: Session, skip: int = 0, limit: int = 100) -> List[Option]:
-    return db.query(Option).offset(skip).limit(limit).all()
+    return db.query(Option).order_by(Option.id).offset(skip).limit(limit).all()
 
 def create_option(db: Session, option: OptionCreate) -> Option:
     db_opt = Option(**option.dict())
@@ -47,52 +357,202 @@ def create_option(db: Session, option: OptionCreate) -> Option:
     db.refresh(db_opt)
     return db_opt
 
-def update_option(db: Session, option_id: int, upd: OptionUpdate) -> Option:
-    db_opt = get_option(db, option_id)
+def update_option(db: Session, db_opt: Option, upd: OptionUpdate) -> Option:
     for field, value in upd.dict(exclude_unset=True).items():
         setattr(db_opt, field, value)
     db.commit()
     db.refresh(db_opt)
     return db_opt
 
+_option_list = TypeAdapter(List[OptionOut])
+
+def _serialize_options(options: List[Option]) -> bytes:
+    return _option_list.dump_json([OptionOut.model_validate(o) for o in options])
+
+def _json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+async def invalidate_lists(services: Iterable[str]):
+    await run_in_threadpool(option_cache.invalidate, services)
+
 # --- CRUD endpoints with broadcasting ---
 @router.post("/", response_model=OptionOut)
 async def add_option(option: OptionCreate, db: Session = Depends(get_db)):
     opt = create_option(db, option)
+    await invalidate_lists(opt.service)
     payload = {
         "action": "created",
         "option": OptionOut.from_orm(opt).model_dump(mode="json")
     }
-    for svc in opt.service:
-        await manager.broadcast(payload, service=svc)
+    await manager.broadcast(payload, service=opt.service)
     return opt
 
 @router.get("/", response_model=List[OptionOut])
 def list_options(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return get_options(db, skip=skip, limit=limit)
+    body = option_cache.get_or_load(
+        ALL_OPTIONS,
+        f"{skip}:{limit}",
+        lambda: _serialize_options(get_options(db, skip=skip, limit=limit)),
+    )
+    return _json_response(body)
+
+def _sse_event(data: str) -> str:
+    """
+    One event per message: an `id:` line (the seq, echoed back by the browser
+    as Last-Event-ID) and a single-line `data:` payload – plain, repetitive
+    text that compresses well.
+    """
+    seq = seq_of(data)
+    if seq is None:
+        return f"data: {data}\n\n"
+    return f"id: {seq}\ndata: {data}\n\n"
+
+@router.get("/sse/options/{service}")
+async def sse_options_endpoint(
+    service: str,
+    since: Optional[int] = None,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Server-Sent Events version of /ws/options/{service} for clients whose
+    proxies drop WebSockets. Same messages and `seq` numbering; a reconnecting
+    EventSource resumes from its Last-Event-ID header (or `?since=`), with
+    the same replay / resync rules. A `: ping` comment is sent on every
+    heartbeat to keep intermediaries from timing the stream out.
+    """
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    sub = await manager.open_stream(service, since=since, load_snapshot=load_snapshot)
+    if sub is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many live connections for this service",
+            headers={"Retry-After": "30"},
+        )
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                data = await sub.queue.get()
+                if data is None:
+                    break
+                yield data if data is manager.HEARTBEAT else _sse_event(data)
+        finally:
+            manager.disconnect(sub.key, service)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _prefix_tsquery(q: str) -> Optional[str]:
+    """'relia bank' → 'relia:* & bank:*' so partially typed names match."""
+    terms = re.findall(r"\w+", q.lower())
+    if not terms:
+        return None
+    return " & ".join(f"{t}:*" for t in terms[:10])
+
+@router.get("/search", response_model=List[OptionOut])
+def search_options(
+    q: str = Query(..., min_length=1, max_length=200),
+    service: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: Session = Depends(get_db),
+):
+    """
+    Full-text search over option titles and messages, best match first.
+
+    Results are limited to `service`, or to the caller's service when a bearer
+    token carrying one is sent. Every word of `q` must match the start of a
+    word in the title or message; title hits rank above message hits.
+    """
+    tsquery_text = _prefix_tsquery(q)
+    if tsquery_text is None:
+        return []
+    if service is None and token:
+        payload = verify_token(token)
+        if payload and payload.get("token_type") == "access":
+            service = payload.get("service")
+
+    tsquery = func.to_tsquery("simple", tsquery_text)
+    rank = func.ts_rank_cd(Option.search_vector, tsquery)
+    query = db.query(Option).filter(Option.search_vector.op("@@")(tsquery))
+    if service:
+        query = query.filter(Option.service.contains([service]))
+    return (
+        query.order_by(rank.desc(), Option.timestamp.desc(), Option.id.desc())
+             .offset(offset)
+             .limit(limit)
+             .all()
+    )
+
+@router.get("/ws/stats")
+def websocket_stats():
+    """Live-feed connection counts per service for the worker serving this request."""
+    return manager.stats()
+
+def _service_for(phone: str, token: Optional[str], db: Session) -> str:
+    """The user's service, from their access token when it carries one, else from the DB."""
+    payload = verify_token(token) if token else None
+    if (
+        payload
+        and payload.get("token_type") == "access"
+        and payload.get("service")
+        and (payload.get("phone_number") or payload.get("sub")) == phone
+    ):
+        return payload["service"]
+
+    row = db.query(UserDetails.service).filter(UserDetails.phone_number == phone).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="User not found")
+    return row.service
 
 @router.get("/{phone}", response_model=List[OptionOut])
 def read_option(
     phone: str,
-    skip: int = 0,
-    limit: int = 100,
+    before_id: Optional[int] = Query(None, description="id of the last option already shown; returns the next older page"),
+    before_timestamp: Optional[datetime] = Query(None, description="timestamp of that option (saves a lookup)"),
+    limit: int = Query(100, ge=1, le=500),
+    skip: int = Query(0, ge=0),
+    token: Optional[str] = Depends(optional_oauth2_scheme),
     db: Session = Depends(get_db),
 ):
-    user = db.query(UserDetails).filter(UserDetails.phone_number == phone).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    """
+    Options for the user's service, newest first.
 
-    return (
-        db.query(Option)
-          .filter(Option.service.any(user.service))   # ← only options whose service-array contains user.service
-          .offset(skip)
-          .limit(limit)
-          .all()
-    )
+    Page with keyset pagination: pass the `id` (and optionally `timestamp`)
+    of the last option received as `before_id` / `before_timestamp`.
+    `skip` (OFFSET) is still accepted for old clients.
+    """
+    service = _service_for(phone, token, db)
+
+    # `service @> ARRAY[...]` is served by the GIN index on researcher.service
+    q = db.query(Option).filter(Option.service.contains([service]))
+    q = q.order_by(Option.timestamp.desc(), Option.id.desc()).limit(limit)
+    if before_id is None and skip:
+        return q.offset(skip).all()
+    if before_id is None:
+        # first page – the app's home screen – is served from the list cache
+        body = option_cache.get_or_load(service, f"first:{limit}", lambda: _serialize_options(q.all()))
+        return _json_response(body)
+
+    if before_timestamp is None:
+        before_timestamp = db.query(Option.timestamp).filter(Option.id == before_id).scalar()
+        if before_timestamp is None:
+            raise HTTPException(status_code=400, detail="Unknown before_id; pass before_timestamp as well")
+    return q.filter(tuple_(Option.timestamp, Option.id) < tuple_(before_timestamp, before_id)).all()
 
 @router.put("/{option_id}", response_model=OptionOut)
 async def edit_option(option_id: int, upd: OptionUpdate, db: Session = Depends(get_db)):
-    opt = update_option(db, option_id, upd)
+    opt = get_option(db, option_id)
+    old_services = list(opt.service)
+    opt = update_option(db, opt, upd)
+    await invalidate_lists(set(old_services) | set(opt.service))
     await manager.broadcast({
         "action": "updated",
         "option": OptionOut.from_orm(opt).model_dump(mode="json")
@@ -113,6 +573,7 @@ async def delete_option(option_id: int, db: Session = Depends(get_db)):
     # delete and commit
     db.delete(opt)
     db.commit()
+    await invalidate_lists(service)
 
     # notify subscribers
     await manager.broadcast({
@@ -122,18 +583,51 @@ async def delete_option(option_id: int, db: Session = Depends(get_db)):
 
     return opt
 
+RESYNC_LIMIT = 100
+
+def _load_snapshot(service: str) -> list:
+    db = SessionLocal()
+    try:
+        options = (
+            db.query(Option)
+              .filter(Option.service.contains([service]))
+              .order_by(Option.timestamp.desc(), Option.id.desc())
+              .limit(RESYNC_LIMIT)
+              .all()
+        )
+        return [OptionOut.from_orm(o).model_dump(mode="json") for o in options]
+    finally:
+        db.close()
+
+async def load_snapshot(service: str) -> list:
+    return await run_in_threadpool(_load_snapshot, service)
+
 # --- WebSocket endpoint for service‐scoped live updates ---
 @router.websocket("/ws/options/{service}")
-async def websocket_options_endpoint(websocket: WebSocket, service: str):
+async def websocket_options_endpoint(websocket: WebSocket, service: str, since: Optional[int] = None):
     """
     Subscribe here to receive live updates for a given service.
     Messages will be of the form:
-      { action: "created"|"updated", option: { ...OptionOut fields... } }
+      { seq: 42, action: "created"|"updated"|"deleted", option: { ...OptionOut fields... } }
+
+    Reconnect with `?since=<last seq received>` to get the missed messages
+    replayed first. If they are no longer buffered, the first message is
+      { action: "resync", seq: 57, options: [ ...newest OptionOut first... ] }
+    which replaces the client's list; any replayed messages after it may
+    repeat options it already contains, so apply them by option id.
+
+    Liveness uses WebSocket ping/pong frames, which clients answer
+    automatically; no heartbeat messages appear in the stream, and the
+    client never needs to send anything.
     """
-    await manager.connect(websocket, service)
+    sub = await manager.connect(websocket, service, since=since, load_snapshot=load_snapshot)
+    if sub is None:
+        return
     try:
         while True:
-            # keep the connection alive; ignore incoming messages
+            # nothing is expected from the client; this only notices the close
             await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket, service)
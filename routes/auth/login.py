@@ -10,6 +10,8 @@ from db.models import UserDetails # Ensure UserDetails now has a 'password' fiel
 from db.schema import OTPRequest, OTPVerify, UserSignupSchema, RefreshTokenRequest, PasswordReset  # Adjust as needed.
 from routes.auth.otp_service import send_otp_msg_mail, verify_otp, validate_phone
 from routes.auth.JWTSecurity import create_access_token, create_refresh_token, save_refresh_token, verify_token
+from routes.Plan.CheckPlan import invalidate_plan_status
+from routes.Plan.active_users import sync_active_user
 from fastapi.responses import JSONResponse
 from datetime import datetime, timedelta
 from fastapi.security import OAuth2PasswordBearer
@@ -65,7 +67,7 @@ def login_email(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Generate tokens
-    access_token = create_access_token({"sub": user.email, "role": user.role, "phone_number": user.phone_number, "name": user.name, "service": user.service, "service_active_date": user.service_active_date})
+    access_token = create_access_token({"sub": user.email, "role": user.role, "phone_number": user.phone_number, "name": user.name, "service": user.service, "service_active_date": user.service_active_date.isoformat() if user.service_active_date else None})
     refresh_token = create_refresh_token(user.phone_number)  # using phone as unique id for refresh tokens
     save_refresh_token(db, user.phone_number, refresh_token)
     
@@ -117,9 +119,10 @@ def verify_otp_endpoint(data: OTPVerify, db: Session = Depends(get_db)):
             role="user",  # default role for regular users
             service_active_date=(
                 datetime.utcnow() + timedelta(days=3)
-            ).date().isoformat()
+            ).date()
         )
         db.add(new_user)
+        sync_active_user(db, new_user.phone_number, new_user.service, new_user.service_active_date)
         db.commit()
         db.refresh(new_user)
         logger.info(f"User registered successfully for phone {phone_number}")
@@ -136,7 +139,7 @@ def verify_otp_endpoint(data: OTPVerify, db: Session = Depends(get_db)):
         if not user:
             logger.error(f"OTP verified for phone {phone_number} but user not found.")
             raise HTTPException(status_code=404, detail="User not registered")
-        access_token = create_access_token({"sub": user.phone_number, "role": user.role})
+        access_token = create_access_token({"sub": user.phone_number, "role": user.role, "phone_number": user.phone_number, "service": user.service})
         refresh_token = create_refresh_token(user.phone_number)
         save_refresh_token(db, user.phone_number, refresh_token)
         logger.info(f"User login via OTP successful for phone {phone_number}")
@@ -168,7 +171,7 @@ def refresh_access_token(data: RefreshTokenRequest, db: Session = Depends(get_db
         raise HTTPException(status_code=401, detail="User not found")
     
     # Generate new access token
-    new_access_token = create_access_token({"sub": user.phone_number, "role": user.role})
+    new_access_token = create_access_token({"sub": user.phone_number, "role": user.role, "phone_number": user.phone_number, "service": user.service})
     return {"access_token": new_access_token, "token_type": "bearer"}
 
 
@@ -243,6 +246,7 @@ def delete_user_by_phone(phone: str, db: Session = Depends(get_db)):
         )
     db.delete(user)
     db.commit()
+    invalidate_plan_status(phone)
     return {"message": "User deleted successfully"}
 
 @router.get("/users", summary="Get all users", response_model=list[UserOut])
@@ -293,8 +297,10 @@ def edit_user(
         user.service_active_date = edits.service_active_date
 
     # 3. Persist
+    sync_active_user(db, user.phone_number, user.service, user.service_active_date)
     db.commit()
     db.refresh(user)
+    invalidate_plan_status(phone)
 
     return user
 
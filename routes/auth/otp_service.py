@@ -86,12 +86,11 @@ async def send_otp_msg_mail(phone_number: str,background_tasks: BackgroundTasks,
         logger.error(f"Error connecting to OTP service for {phone_number}: {str(e)}")
         raise HTTPException(status_code=500, detail="Error connecting to OTP service")
 
-    if email:
-        await Otp_mail(email, otp)
-    
-    # 4. Save the OTP in the database
+    # 4. Save the OTP in the database (the OTP mail is committed with it)
     db_obj = OTP(mobile=phone_number, otp=otp)
     db.add(db_obj)
+    if email:
+        Otp_mail(email, otp, db)
     db.commit()
     db.refresh(db_obj)
      # 5. Schedule it for deletion in 30 minutes
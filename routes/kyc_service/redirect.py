@@ -111,7 +111,7 @@ async def response_url_endpoint(request: Request,response: Response,UUID_id: str
 
     key = f"kyc_documents/{UUID_id}.pdf"
     await write_pdf_to_s3(pdf_response.content,key)
-    await send_agreement(kyc_user.email,kyc_user.full_name,pdf_response.content)
+    send_agreement(kyc_user.email,kyc_user.full_name,pdf_response.content,db)
 
     # ✅ Convert PDF to Base64 and save in DB
     base64_pdf = base64.b64encode(pdf_response.content).decode('utf-8')
@@ -176,7 +176,7 @@ async def response_url_endpoint(request: Request,response: Response,UUID_id: str
     await write_pdf_to_s3(pdf_response.content,key)
     EStampUser = db.query(EStamp).filter(EStamp.UUID_id == UUID_id).first()
     EStampUser.file = key
-    await Final_send_agreement(EStampUser.recepient_email, EStampUser.second_party_name,EStampUser.mail_subject, EStampUser.mail_body, pdf_response.content )
+    Final_send_agreement(EStampUser.recepient_email, EStampUser.second_party_name,EStampUser.mail_subject, EStampUser.mail_body, pdf_response.content, db)
     db.commit()
     db.refresh(EStampUser)
     
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from email.message import Message
+from typing import List, Optional
+
+import aiosmtplib
+
+from config import (
+    logger,
+    COM_SMTP_SERVER,
+    COM_SMTP_PORT,
+    COM_SMTP_USER,
+    COM_SMTP_PASSWORD,
+    COM_SMTP_POOL_SIZE,
+)
+
+
+class AsyncSMTPTransport:
+    """
+    Non-blocking SMTP sender with a small pool of logged-in aiosmtplib sessions.
+
+    Used by the transactional mails (OTP, KYC agreement, e-stamp signing and
+    settlement) so a send no longer blocks the event loop, and consecutive
+    sends reuse an authenticated TLS session instead of reconnecting.
+    """
+
+    # sessions idle longer than this are NOOP-checked before reuse
+    IDLE_CHECK_AFTER = 60.0
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str,
+        password: str,
+        size: int = 2,
+        max_messages: int = 100,
+        timeout: float = 30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.size = max(1, size)
+        self.max_messages = max(1, max_messages)
+        self.timeout = timeout
+        self._idle: List[tuple] = []  # (client, sent, last_used)
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def _open(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=self.host,
+            port=self.port,
+            use_tls=True,
+            timeout=self.timeout,
+        )
+        await client.connect()
+        await client.login(self.user, self.password)
+        return client
+
+    @staticmethod
+    async def _close(client: aiosmtplib.SMTP):
+        try:
+            await client.quit()
+        except Exception:
+            client.close()
+
+    async def _acquire(self) -> tuple:
+        while self._idle:
+            client, sent, last_used = self._idle.pop()
+            if not client.is_connected:
+                continue
+            if time.monotonic() - last_used > self.IDLE_CHECK_AFTER:
+                try:
+                    await client.noop()
+                except Exception:
+                    client.close()
+                    continue
+            return client, sent
+        return await self._open(), 0
+
+    def _release(self, client: aiosmtplib.SMTP, sent: int):
+        if sent >= self.max_messages or not client.is_connected:
+            client.close()
+        else:
+            self._idle.append((client, sent, time.monotonic()))
+
+    async def send_message(self, msg: Message, retries: int = 1):
+        """
+        Send one message. A dropped session is replaced and the send retried;
+        server rejections (bad recipient etc.) are raised to the caller.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+
+        async with self._slots:
+            attempt = 0
+            while True:
+                client, sent = await self._acquire()
+                try:
+                    await client.send_message(msg)
+                except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError,
+                        ConnectionError, asyncio.TimeoutError) as exc:
+                    client.close()
+                    attempt += 1
+                    if attempt > retries:
+                        raise
+                    logger.warning(f"SMTP session dropped ({exc}); reconnecting")
+                    continue
+                except Exception:
+                    self._release(client, sent)
+                    raise
+                self._release(client, sent + 1)
+                return
+
+    async def close_all(self):
+        while self._idle:
+            client, _, _ = self._idle.pop()
+            await self._close(client)
+
+
+# compliance@ mailbox used by all transactional (non-bulk) mails
+compliance_mail_transport = AsyncSMTPTransport(
+    host=COM_SMTP_SERVER,
+    port=int(COM_SMTP_PORT),
+    user=COM_SMTP_USER,
+    password=COM_SMTP_PASSWORD,
+    size=COM_SMTP_POOL_SIZE,
+)
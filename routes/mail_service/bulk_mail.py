@@ -1,132 +1,123 @@
 from __future__ import annotations
 
-import io
-import ssl
-from email.mime.application import MIMEApplication
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from typing import List, Optional
+from typing import List
 
-import pandas as pd
-import smtplib
-from fastapi import APIRouter, BackgroundTasks, File, Form, UploadFile
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
 
-from config import SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASSWORD
+from db.connection import get_db
+from db.models import MailCampaign, MailCampaignAttachment, MailCampaignRecipient
 
-router = APIRouter(tags=["Bulk Mail"])
-
-# ─────────────── helper to send one email ──────────────────────────────
-def send_mail(
-    *,
-    email: str,
-    name: str,
-    files: Optional[List[dict]] = None,
-    content: str,
-    subject: str,
-):
-    try:
-        root = MIMEMultipart("related")
-        root["From"] = "Pride Trading Consultancy Pvt. Ltd. <research@pridecons.com>"
-        root["To"] = email
-        root["Subject"] = subject
-
-        html_body = f"""
-        <html>
-          <body style="font-family:sans-serif;line-height:1.4;">
-            <p>Dear <strong>{name}</strong>,</p>
-            <div>{content}</div>
-
-            <hr style="margin:30px 0;border:none;border-top:1px solid #ccc;"/>
-
-            <footer style="text-align:center;font-size:.9em;color:#666;">
-            <p>
-            Our past performance does not guarantee the future performance. Investment in market is subject to market risks. Not with standing all the efforts to do best research, clients should understand that investing in market involves a risk of loss of both income and principal. Please ensure that you understand fully the risks involved in investment in market. <br>  <br>
-“Registration granted by SEBI, membership of a SEBI recognized supervisory body (if any) and certification from NISM in no way guarantee performance of the intermediary or provide any assurance of returns to investors.” “Investment in securities market are subject to market risks. Read all the related documents carefully before investing.” "The securities quoted are for illustration only and are not recommendatory"
-
-              </p>
-              <img src="https://drive.google.com/uc?export=view&id=1PZ76KIfydm8Wtwip58354MMpR_96z0ta"
-              alt="Pride Logo" style="width: 260px; margin-top: 10px;" />
-            </footer>
-          </body>
-        </html>
-        """
-
-        root.attach(MIMEText(html_body, "html"))
-
-        # Attach only PDF files
-        if files:
-            for f in files:
-                part = MIMEApplication(f["content"], _subtype="pdf")
-                part.add_header("Content-Disposition", "attachment", filename=f["filename"])
-                root.attach(part)
-
-        with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT, context=ssl.create_default_context()) as s:
-            s.login(SMTP_USER, SMTP_PASSWORD)
-            s.send_message(root)
-
-        return {"message": "Mail sent", "email": email}
-
-    except Exception as exc:
-        return JSONResponse(
-            {"message": "Failed to send email", "error": str(exc)}, status_code=500
-        )
+from routes.mail_service.recipient_reader import RecipientReader
 
+router = APIRouter(tags=["Bulk Mail"])
 
 # ─────────────── bulk endpoint ─────────────────────────────────────────
 @router.post("/bulk-send-mail/")
 async def bulk_send_mail(
-    background_tasks: BackgroundTasks,
-    sheet: UploadFile = File(..., description="Excel (.xlsx) with 'name' & 'mail'"),
+    sheet: UploadFile = File(..., description="Excel (.xlsx) or .csv with 'name' & 'mail'"),
     subject: str = Form(...),
     content: str = Form(...),
     attachments: List[UploadFile] = File(
         default=None, description="Attach one or many PDF files (repeat the field)"
-    )
+    ),
+    db: Session = Depends(get_db),
 ):
     """
-    Reads the sheet, dedups, sends personalised emails (background), with
-    optional PDF attachment(s).
+    Creates a persistent campaign from the sheet: recipients are streamed,
+    validated + deduped and stored chunk by chunk, with optional PDF
+    attachment(s). The campaign worker sends them in the background (and
+    resumes after a restart); poll GET /bulk-send-mail/{campaign_id}.
     """
     try:
-        df = pd.read_excel(io.BytesIO(await sheet.read()))
-        if {"name", "mail"} - set(df.columns):
-            return JSONResponse(
-                {"error": "Sheet must contain 'name' and 'mail' columns."}, 400
-            )
-
-        df["mail"] = df["mail"].str.strip().str.lower()
-        df = df.drop_duplicates(subset="mail")
+        reader = await run_in_threadpool(RecipientReader, sheet.file, sheet.filename)
+    except ValueError as exc:
+        return JSONResponse({"error": str(exc)}, 400)
+    except Exception as exc:
+        return JSONResponse({"error": str(exc)}, status_code=500)
 
+    campaign = MailCampaign(subject=subject, content=content, status="loading")
+    try:
         # Process attachments - only PDF
         files_raw = attachments if attachments else []
-        file_payloads: list[dict] = []
         for up in files_raw:
             if not getattr(up, "filename", "").lower().endswith(".pdf"):
                 continue
             await up.seek(0)
-            file_payloads.append(
-                {
-                    "filename": up.filename,
-                    "content": await up.read(),
-                }
+            campaign.attachments.append(
+                MailCampaignAttachment(filename=up.filename, content=await up.read())
             )
-
-        # Schedule background email tasks
-        for _, row in df.iterrows():
-            background_tasks.add_task(
-                send_mail,
-                email=row["mail"],
-                name=row["name"],
-                files=file_payloads,
-                content=content,
-                subject=subject,
+        db.add(campaign)
+        db.commit()
+
+        # Store recipients chunk by chunk as the sheet is read; the worker
+        # starts sending the first chunks while the rest is still loading.
+        chunks = iter(reader)
+        while True:
+            chunk = await run_in_threadpool(next, chunks, None)
+            if chunk is None:
+                break
+            db.execute(
+                pg_insert(MailCampaignRecipient)
+                .values([
+                    {"campaign_id": campaign.id, "email": r["email"], "name": r["name"]}
+                    for r in chunk
+                ])
+                .on_conflict_do_nothing(constraint="uq_mail_campaign_recipient")
             )
+            db.commit()
+
+        campaign.total = reader.accepted
+        campaign.status = "running"
+        db.commit()
 
         return {
-            "message": f"Scheduled {len(df)} email(s) with "
-                       f"{len(file_payloads)} PDF attachment(s)."
+            "message": f"Scheduled {reader.accepted} email(s) with "
+                       f"{len(campaign.attachments)} PDF attachment(s).",
+            "campaign_id": campaign.id,
+            "total_rows": reader.total_rows,
+            "skipped_invalid": reader.invalid,
+            "skipped_duplicates": reader.duplicates,
         }
 
     except Exception as exc:
+        db.rollback()
+        if campaign.id is not None:
+            # stop the worker from sending a half-loaded campaign
+            db.query(MailCampaign).filter(MailCampaign.id == campaign.id).update(
+                {"status": "failed"}, synchronize_session=False
+            )
+            db.commit()
         return JSONResponse({"error": str(exc)}, status_code=500)
+
+
+@router.get("/bulk-send-mail/{campaign_id}")
+def bulk_mail_status(campaign_id: str, db: Session = Depends(get_db)):
+    """
+    Progress of a bulk-mail campaign: sent / failed / pending counts.
+    """
+    campaign = db.query(MailCampaign).filter(MailCampaign.id == campaign_id).first()
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+
+    counts = dict(
+        db.query(MailCampaignRecipient.status, func.count(MailCampaignRecipient.id))
+        .filter(MailCampaignRecipient.campaign_id == campaign_id)
+        .group_by(MailCampaignRecipient.status)
+        .all()
+    )
+    return {
+        "campaign_id": campaign.id,
+        "subject": campaign.subject,
+        "status": campaign.status,
+        "total": campaign.total,
+        "sent": counts.get("sent", 0),
+        "failed": counts.get("failed", 0),
+        "pending": counts.get("pending", 0) + counts.get("sending", 0),
+        "created_at": campaign.created_at,
+        "completed_at": campaign.completed_at,
+    }
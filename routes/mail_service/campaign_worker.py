@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import asyncio
+import smtplib
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from cachetools import LRUCache
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, exists, func, or_, select
+from sqlalchemy.engine import Connection
+
+from config import (
+    logger,
+    BULK_MAIL_RATE_PER_SECOND,
+    BULK_MAIL_CONCURRENCY,
+    BULK_MAIL_MAX_ATTEMPTS,
+    BULK_MAIL_POLL_INTERVAL,
+)
+from db.connection import SessionLocal, engine
+from db.models import MailCampaign, MailCampaignRecipient
+from routes.mail_service.mail_template import CampaignMessageTemplate
+from routes.mail_service.smtp_pool import bulk_smtp_pool
+
+# A row stuck in 'sending' longer than this belongs to a worker that died
+# mid-send (restart / crash) and is handed out again.
+STALE_CLAIM_AFTER = timedelta(minutes=10)
+ACTIVE_CAMPAIGN_STATES = ("loading", "running")
+# pg advisory lock held by the one worker process that sends campaign mail
+CAMPAIGN_SENDER_LOCK_KEY = 50_028_001
+
+
+class CampaignWorker:
+    """
+    Drains `mail_campaign_recipients` in the background.
+
+    Every uvicorn worker runs one of these, but only the process holding the
+    session-level advisory lock CAMPAIGN_SENDER_LOCK_KEY sends; the others
+    wait and take over if its DB session goes away. `rate_per_second` is
+    therefore the global send rate, whatever the number of workers. Rows are
+    still claimed with SELECT … FOR UPDATE SKIP LOCKED, and because all state
+    lives in the DB a restart simply resumes where the previous process stopped.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float = 5.0,
+        concurrency: int = 4,
+        max_attempts: int = 3,
+        poll_interval: float = 5.0,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.poll_interval = poll_interval
+        self._min_interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_send_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._templates: LRUCache = LRUCache(maxsize=16)
+        # connection holding the sender lock while this process is the sender
+        self._leader: Optional[Connection] = None
+
+    # ── lifecycle ───────────────────────────────────────────────────────
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await run_in_threadpool(self._release_leadership)
+
+    # ── sender election ─────────────────────────────────────────────────
+    def _hold_leadership(self) -> bool:
+        """True while this process holds the sender lock (acquiring it if free)."""
+        if self._leader is not None:
+            try:
+                self._leader.execute(select(1))
+                return True
+            except Exception:
+                # session lost, and with it the lock: another worker may take over
+                logger.warning("Bulk-mail sender lost its DB session; re-electing")
+                self._release_leadership()
+        conn = engine.connect()
+        try:
+            got = conn.execute(select(func.pg_try_advisory_lock(CAMPAIGN_SENDER_LOCK_KEY))).scalar()
+            conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        if not got:
+            conn.close()
+            return False
+        logger.info("This worker is now the bulk-mail sender")
+        self._leader = conn
+        return True
+
+    def _release_leadership(self):
+        if self._leader is not None:
+            try:
+                # drop the DB session instead of returning it to the pool,
+                # which releases the session-level lock with it
+                self._leader.invalidate()
+                self._leader.close()
+            except Exception:
+                pass
+            self._leader = None
+
+    async def _run(self):
+        while True:
+            try:
+                if not await run_in_threadpool(self._hold_leadership):
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                sent = await self._drain_once()
+                await run_in_threadpool(self._complete_finished_campaigns)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error(f"Bulk-mail campaign worker error: {exc}", exc_info=True)
+                sent = 0
+            if not sent:
+                await asyncio.sleep(self.poll_interval)
+
+    # ── DB helpers (run in the threadpool) ──────────────────────────────
+    def _claim_batch(self, limit: int) -> List[Dict]:
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(MailCampaignRecipient)
+                .join(MailCampaign, MailCampaign.id == MailCampaignRecipient.campaign_id)
+                .filter(
+                    MailCampaign.status.in_(ACTIVE_CAMPAIGN_STATES),
+                    or_(
+                        MailCampaignRecipient.status == "pending",
+                        and_(
+                            MailCampaignRecipient.status == "sending",
+                            MailCampaignRecipient.claimed_at < now - STALE_CLAIM_AFTER,
+                        ),
+                    ),
+                )
+                .order_by(MailCampaignRecipient.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True, of=MailCampaignRecipient)
+                .all()
+            )
+            claimed = []
+            for row in rows:
+                row.status = "sending"
+                row.claimed_at = now
+                row.attempts += 1
+                claimed.append({
+                    "id": row.id,
+                    "campaign_id": row.campaign_id,
+                    "email": row.email,
+                    "name": row.name,
+                    "attempts": row.attempts,
+                })
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _record_results(self, results: List[Dict]):
+        db = SessionLocal()
+        try:
+            db.bulk_update_mappings(MailCampaignRecipient, results)
+            db.commit()
+        finally:
+            db.close()
+
+    def _complete_finished_campaigns(self):
+        db = SessionLocal()
+        try:
+            unfinished = exists().where(
+                MailCampaignRecipient.campaign_id == MailCampaign.id,
+                MailCampaignRecipient.status.in_(("pending", "sending")),
+            )
+            (
+                db.query(MailCampaign)
+                .filter(MailCampaign.status == "running", ~unfinished)
+                .update(
+                    {"status": "completed", "completed_at": datetime.now(timezone.utc)},
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _load_template(self, campaign_id: str) -> CampaignMessageTemplate:
+        db = SessionLocal()
+        try:
+            campaign = db.query(MailCampaign).filter(MailCampaign.id == campaign_id).one()
+            # attachments are base64-encoded here, once per campaign per process
+            return CampaignMessageTemplate(
+                subject=campaign.subject,
+                content=campaign.content,
+                files=[
+                    {"filename": a.filename, "content": a.content}
+                    for a in campaign.attachments
+                ],
+            )
+        finally:
+            db.close()
+
+    # ── sending ─────────────────────────────────────────────────────────
+    async def _template(self, campaign_id: str) -> CampaignMessageTemplate:
+        template = self._templates.get(campaign_id)
+        if template is None:
+            template = await run_in_threadpool(self._load_template, campaign_id)
+            self._templates[campaign_id] = template
+        return template
+
+    async def _throttle(self):
+        if not self._min_interval:
+            return
+        now = time.monotonic()
+        wait = self._next_send_at - now
+        self._next_send_at = max(now, self._next_send_at) + self._min_interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _send_one(self, row: Dict, slots: asyncio.Semaphore) -> Dict:
+        async with slots:
+            await self._throttle()
+            result = {"id": row["id"]}
+            try:
+                template = await self._template(row["campaign_id"])
+                msg = template.render(email=row["email"], name=row["name"] or "")
+                await run_in_threadpool(bulk_smtp_pool.send_message, msg)
+                result.update(status="sent", error=None, sent_at=datetime.now(timezone.utc))
+            except Exception as exc:
+                permanent = isinstance(exc, smtplib.SMTPRecipientsRefused)
+                retry = not permanent and row["attempts"] < self.max_attempts
+                result.update(status="pending" if retry else "failed", error=str(exc))
+            return result
+
+    async def _drain_once(self) -> int:
+        rows = await run_in_threadpool(self._claim_batch, self.concurrency * 10)
+        if not rows:
+            return 0
+        slots = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._send_one(row, slots) for row in rows))
+        await run_in_threadpool(self._record_results, list(results))
+        return len(rows)
+
+
+campaign_worker = CampaignWorker(
+    rate_per_second=BULK_MAIL_RATE_PER_SECOND,
+    concurrency=BULK_MAIL_CONCURRENCY,
+    max_attempts=BULK_MAIL_MAX_ATTEMPTS,
+    poll_interval=BULK_MAIL_POLL_INTERVAL,
+)
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import binascii
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.nonmultipart import MIMENonMultipart
+from typing import List, Optional
+
+SENDER = "Pride Trading Consultancy Pvt. Ltd. <research@pridecons.com>"
+
+# Static parts of the research-mail HTML; only the recipient name and the
+# campaign content are substituted in between.
+_HTML_HEAD = """
+    <html>
+      <body style="font-family:sans-serif;line-height:1.4;">
+        <p>Dear <strong>"""
+
+_HTML_AFTER_NAME = """</strong>,</p>
+        <div>"""
+
+_HTML_FOOTER = """</div>
+
+        <hr style="margin:30px 0;border:none;border-top:1px solid #ccc;"/>
+
+        <footer style="text-align:center;font-size:.9em;color:#666;">
+        <p>
+        Our past performance does not guarantee the future performance. Investment in market is subject to market risks. Not with standing all the efforts to do best research, clients should understand that investing in market involves a risk of loss of both income and principal. Please ensure that you understand fully the risks involved in investment in market. <br>  <br>
+“Registration granted by SEBI, membership of a SEBI recognized supervisory body (if any) and certification from NISM in no way guarantee performance of the intermediary or provide any assurance of returns to investors.” “Investment in securities market are subject to market risks. Read all the related documents carefully before investing.” "The securities quoted are for illustration only and are not recommendatory"
+
+          </p>
+          <img src="https://drive.google.com/uc?export=view&id=1PZ76KIfydm8Wtwip58354MMpR_96z0ta"
+          alt="Pride Logo" style="width: 260px; margin-top: 10px;" />
+        </footer>
+      </body>
+    </html>
+    """
+
+
+def _qp_segment(text: str) -> str:
+    """
+    Quoted-printable encoding of one piece of the HTML body, ending in a soft
+    line break so independently encoded pieces can simply be concatenated.
+    """
+    encoded = binascii.b2a_qp(text.encode("utf-8")).decode("ascii")
+    encoded = encoded.replace("\r\n", "\n")
+    if encoded and not encoded.endswith("\n"):
+        encoded += "=\n"
+    return encoded
+
+
+class CampaignMessageTemplate:
+    """
+    Everything in a bulk mail that is the same for every recipient, built once.
+
+    The HTML around the recipient name (greeting, campaign content, footer) is
+    quoted-printable encoded up front and every PDF is wrapped in a
+    MIMEApplication (base64-encoded) up front; `render()` then only encodes
+    the recipient name, joins the pre-encoded pieces and re-attaches the
+    already-encoded attachment parts.
+    """
+
+    def __init__(self, *, subject: str, content: str, files: Optional[List[dict]] = None):
+        self.subject = subject
+        self._html_prefix = _qp_segment(_HTML_HEAD)
+        self._html_suffix = _qp_segment(_HTML_AFTER_NAME + content + _HTML_FOOTER)
+
+        # Attach only PDF files
+        self._attachments: List[MIMEApplication] = []
+        for f in files or []:
+            part = MIMEApplication(f["content"], _subtype="pdf")
+            part.add_header("Content-Disposition", "attachment", filename=f["filename"])
+            self._attachments.append(part)
+
+    def render(self, *, email: str, name: str) -> MIMEMultipart:
+        root = MIMEMultipart("related")
+        root["From"] = SENDER
+        root["To"] = email
+        root["Subject"] = self.subject
+
+        html = MIMENonMultipart("text", "html", charset="utf-8")
+        html["Content-Transfer-Encoding"] = "quoted-printable"
+        html.set_payload(self._html_prefix + _qp_segment(name) + self._html_suffix)
+        root.attach(html)
+        for part in self._attachments:
+            root.attach(part)
+        return root
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import email
+import email.policy
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from typing import Dict, List, Optional
+
+import aiosmtplib
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from config import (
+    logger,
+    OUTBOX_POLL_INTERVAL,
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_MAX_ATTEMPTS,
+)
+from db.connection import SessionLocal
+from db.models import EmailOutbox
+from routes.mail_service.async_transport import compliance_mail_transport
+
+STALE_CLAIM_AFTER = timedelta(minutes=10)
+MAX_BACKOFF = timedelta(hours=1)
+
+
+def enqueue_email(db: Session, msg: EmailMessage) -> EmailOutbox:
+    """
+    Stage `msg` in the email outbox on the caller's session.
+
+    Nothing is committed here: the row becomes visible to the drainer together
+    with the caller's own changes when the caller commits, and disappears with
+    them on rollback.
+    """
+    row = EmailOutbox(
+        recipient=str(msg["To"] or ""),
+        subject=str(msg["Subject"] or "")[:255],
+        message=msg.as_bytes(),
+    )
+    db.add(row)
+    return row
+
+
+def _backoff(attempts: int) -> timedelta:
+    return min(timedelta(seconds=30 * 2 ** (attempts - 1)), MAX_BACKOFF)
+
+
+class OutboxDrainer:
+    """
+    Background task that delivers `email_outbox` rows.
+
+    Batches are claimed with FOR UPDATE SKIP LOCKED (safe with several uvicorn
+    workers) and sent concurrently over the pooled compliance SMTP transport.
+    Failures are retried with exponential backoff until `max_attempts`, server
+    rejections of the recipient are failed immediately.
+    """
+
+    def __init__(self, poll_interval: float = 1.0, batch_size: int = 50, max_attempts: int = 8):
+        self.poll_interval = poll_interval
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                sent = await self._drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error(f"Email outbox drainer error: {exc}", exc_info=True)
+                sent = 0
+            if not sent:
+                await asyncio.sleep(self.poll_interval)
+
+    # ── DB helpers (run in the threadpool) ──────────────────────────────
+    def _claim_batch(self) -> List[Dict]:
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(EmailOutbox)
+                .filter(
+                    or_(
+                        and_(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now),
+                        and_(EmailOutbox.status == "sending", EmailOutbox.next_attempt_at < now - STALE_CLAIM_AFTER),
+                    )
+                )
+                .order_by(EmailOutbox.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            claimed = []
+            for row in rows:
+                row.status = "sending"
+                row.attempts += 1
+                # doubles as the claim time for stale-claim recovery
+                row.next_attempt_at = now
+                claimed.append({"id": row.id, "attempts": row.attempts, "message": row.message})
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _record_results(self, results: List[Dict]):
+        db = SessionLocal()
+        try:
+            db.bulk_update_mappings(EmailOutbox, results)
+            db.commit()
+        finally:
+            db.close()
+
+    # ── sending ─────────────────────────────────────────────────────────
+    async def _send_one(self, row: Dict) -> Dict:
+        result = {"id": row["id"]}
+        try:
+            msg = email.message_from_bytes(row["message"], policy=email.policy.default)
+            await compliance_mail_transport.send_message(msg)
+            result.update(status="sent", last_error=None, sent_at=datetime.now(timezone.utc))
+        except Exception as exc:
+            permanent = isinstance(exc, aiosmtplib.SMTPRecipientsRefused)
+            if permanent or row["attempts"] >= self.max_attempts:
+                result.update(status="failed", last_error=str(exc))
+                logger.error(f"Outbox mail {row['id']} failed permanently: {exc}")
+            else:
+                result.update(
+                    status="pending",
+                    last_error=str(exc),
+                    next_attempt_at=datetime.now(timezone.utc) + _backoff(row["attempts"]),
+                )
+        return result
+
+    async def _drain_once(self) -> int:
+        rows = await run_in_threadpool(self._claim_batch)
+        if not rows:
+            return 0
+        # concurrency is bounded by the transport's session pool
+        results = await asyncio.gather(*(self._send_one(row) for row in rows))
+        await run_in_threadpool(self._record_results, list(results))
+        return len(rows)
+
+
+outbox_drainer = OutboxDrainer(
+    poll_interval=OUTBOX_POLL_INTERVAL,
+    batch_size=OUTBOX_BATCH_SIZE,
+    max_attempts=OUTBOX_MAX_ATTEMPTS,
+)
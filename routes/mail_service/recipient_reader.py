@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import csv
+import io
+from typing import BinaryIO, Iterator, List, Optional
+
+from email_validator import EmailNotValidError, validate_email
+from openpyxl import load_workbook
+
+REQUIRED_COLUMNS = ("name", "mail")
+
+
+class RecipientReader:
+    """
+    Streams recipients out of an uploaded .xlsx / .csv sheet without loading
+    the whole file into memory.
+
+    Rows are read one at a time (openpyxl read-only mode / csv.reader), the
+    address is validated and normalised, duplicates are dropped, and valid
+    recipients are yielded in lists of `chunk_size`:
+
+        reader = RecipientReader(upload.file, upload.filename)
+        for chunk in reader:
+            ...  # [{"name": "...", "email": "..."}, ...]
+
+    The header row is checked on construction, so a sheet without 'name' and
+    'mail' columns raises ValueError before anything is scheduled.
+    """
+
+    def __init__(self, fileobj: BinaryIO, filename: str, chunk_size: int = 500):
+        self.chunk_size = max(1, chunk_size)
+        self.total_rows = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self._seen: set[str] = set()
+        self._workbook = None
+
+        name = (filename or "").lower()
+        if name.endswith((".xlsx", ".xlsm")):
+            self._workbook = load_workbook(fileobj, read_only=True, data_only=True)
+            rows = self._workbook.active.iter_rows(values_only=True)
+        elif name.endswith(".csv"):
+            text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+            rows = csv.reader(text)
+        else:
+            raise ValueError("Unsupported sheet type; upload an .xlsx or .csv file.")
+
+        self._rows = iter(rows)
+        header = [str(c).strip().lower() if c is not None else "" for c in next(self._rows, ())]
+        missing = [col for col in REQUIRED_COLUMNS if col not in header]
+        if missing:
+            self.close()
+            raise ValueError("Sheet must contain 'name' and 'mail' columns.")
+        self._name_idx = header.index("name")
+        self._mail_idx = header.index("mail")
+
+    def _parse(self, row) -> Optional[dict]:
+        if row is None or len(row) <= max(self._name_idx, self._mail_idx):
+            return None
+        raw_mail = row[self._mail_idx]
+        if raw_mail is None or not str(raw_mail).strip():
+            return None
+        try:
+            email = validate_email(
+                str(raw_mail).strip(), check_deliverability=False
+            ).normalized.lower()
+        except EmailNotValidError:
+            self.invalid += 1
+            return None
+        if email in self._seen:
+            self.duplicates += 1
+            return None
+        self._seen.add(email)
+
+        name = row[self._name_idx]
+        return {"name": str(name).strip() if name is not None else "", "email": email}
+
+    def __iter__(self) -> Iterator[List[dict]]:
+        chunk: List[dict] = []
+        try:
+            for row in self._rows:
+                self.total_rows += 1
+                recipient = self._parse(row)
+                if recipient is None:
+                    continue
+                chunk.append(recipient)
+                if len(chunk) >= self.chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+        finally:
+            self.close()
+
+    @property
+    def accepted(self) -> int:
+        return len(self._seen)
+
+    def close(self):
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import queue
+import smtplib
+import ssl
+import threading
+from email.message import Message
+
+from config import (
+    logger,
+    SMTP_SERVER,
+    SMTP_PORT,
+    SMTP_USER,
+    SMTP_PASSWORD,
+    SMTP_POOL_SIZE,
+    SMTP_MAX_MESSAGES_PER_CONNECTION,
+)
+
+
+class _PooledConnection:
+    """An authenticated SMTP_SSL session plus the number of messages sent on it."""
+
+    def __init__(self, smtp: smtplib.SMTP_SSL):
+        self.smtp = smtp
+        self.sent = 0
+
+
+class SMTPConnectionPool:
+    """
+    Keeps up to `size` authenticated SMTP sessions alive and hands them out to
+    senders, so a campaign pays for a handful of TLS handshakes + logins instead
+    of one per recipient.
+
+    - sessions are recycled after `max_messages` sends (providers drop long sessions)
+    - a session that fails mid-send is discarded and the send retried on a fresh one
+
+    Sending rate is not limited here; the campaign worker paces sends globally.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str,
+        password: str,
+        size: int = 4,
+        max_messages: int = 100,
+        timeout: float = 30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.size = max(1, size)
+        self.max_messages = max(1, max_messages)
+        self.timeout = timeout
+
+        self._idle: "queue.LifoQueue[_PooledConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+
+    # ── connection lifecycle ────────────────────────────────────────────
+    def _open(self) -> _PooledConnection:
+        smtp = smtplib.SMTP_SSL(
+            self.host,
+            self.port,
+            timeout=self.timeout,
+            context=ssl.create_default_context(),
+        )
+        smtp.login(self.user, self.password)
+        return _PooledConnection(smtp)
+
+    @staticmethod
+    def _close(conn: _PooledConnection):
+        try:
+            conn.smtp.quit()
+        except Exception:
+            try:
+                conn.smtp.close()
+            except Exception:
+                pass
+
+    def _acquire(self) -> _PooledConnection:
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return self._open()
+            except Exception:
+                self._slots.release()
+                raise
+
+    def _release(self, conn: _PooledConnection | None):
+        if conn is not None:
+            if conn.sent >= self.max_messages:
+                self._close(conn)
+            else:
+                self._idle.put(conn)
+        self._slots.release()
+
+    # ── public API ──────────────────────────────────────────────────────
+    def send_message(self, msg: Message, retries: int = 2):
+        """
+        Send one message over a pooled session. Connection-level failures are
+        retried on a fresh session; recipient/content errors are raised as-is.
+        """
+        attempt = 0
+        while True:
+            conn = self._acquire()
+            try:
+                conn.smtp.send_message(msg)
+                conn.sent += 1
+                self._release(conn)
+                return
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+                # the server rejected this message – the session itself is still fine
+                self._release(conn)
+                raise
+            except OSError as exc:
+                # SMTPServerDisconnected, socket/TLS errors: the session is unusable,
+                # drop it and try again on a new one
+                self._close(conn)
+                self._release(None)
+                attempt += 1
+                if attempt > retries:
+                    raise
+                logger.warning(f"SMTP session dropped ({exc}); reconnecting, attempt {attempt}")
+            except Exception:
+                self._release(conn)
+                raise
+
+    def close_all(self):
+        """Close every idle session (used on shutdown)."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(conn)
+
+
+bulk_smtp_pool = SMTPConnectionPool(
+    host=SMTP_SERVER,
+    port=int(SMTP_PORT or 465),
+    user=SMTP_USER,
+    password=SMTP_PASSWORD,
+    size=SMTP_POOL_SIZE,
+    max_messages=SMTP_MAX_MESSAGES_PER_CONNECTION,
+)
@@ -0,0 +1,7 @@
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from config import NOTIFICATION_TIMEZONE
+
+# Process-wide APScheduler instance; started / stopped from main.py.
+# Jobs run in its thread pool, so they may use blocking DB / FCM calls.
+scheduler = BackgroundScheduler(timezone=NOTIFICATION_TIMEZONE)